@@ -0,0 +1,363 @@
+"""
+ASGI config for bowling project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 1.9 has no async views so the hot endpoints, polling a game score with
+GET /game/?game=N, checking the next roll with GET /roll/?game=N and adding a roll with POST /roll/,
+are served here by async handlers.
+They run the same request functions as the Django views (see bowling.views.result_response)
+in a thread pool, so the parameters are validated and the responses rendered the same way.
+The score streams of GET /game/<id>/stream wait for rolls in the event loop so idle ones are cheap.
+Every other request (and a POST /roll/ body these handlers cannot parse) is passed to the Django
+WSGI application running in a thread.
+
+Requires asgiref (see requirements/asgi.txt), run with eg.
+uvicorn bowling.asgi:application
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from urllib.parse import parse_qsl
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bowling.settings_api")
+django.setup()
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connections
+from django.utils.http import quote_etag
+from rest_framework.exceptions import ValidationError
+
+from . import metrics
+from .middleware import instrument
+from .pubsub import get_pubsub
+from .renderers import event
+from .score import finished
+from .stream import HEARTBEAT, last_event_id, score_event
+from .views import GAME_NOT_FOUND, add_roll, error_result, find_game, game_info, next_roll_info
+
+wsgi_application = WsgiToAsgi(get_wsgi_application())
+
+
+def _database(function):
+    """
+    Wraps a function using the database or the cache to run in the thread pool.
+    Each thread keeps its own connection which is closed as usual after CONN_MAX_AGE.
+    The wrapped function takes the measurements of the request from metrics.new_request() first,
+    the SQL queries and the scoring time of the call are added to them.
+
+    :param function: Function to wrap
+    :type function: callable
+
+    :rtype: callable
+    """
+    def run(request, *args, **kwargs):
+        close_old_connections()
+
+        for connection in connections.all():
+            instrument(connection)
+
+        metrics.start_request(request)
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.stop_request()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+_get_game = _database(find_game)
+_game_info = _database(game_info)
+_next_roll_info = _database(next_roll_info)
+_add_roll = _database(add_roll)
+
+
+async def _read_body(receive):
+    """
+    Reads the whole request body
+
+    :rtype: bytes
+    """
+    body = b''
+
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+
+        if not message.get('more_body'):
+            return body
+
+
+def _replay(body):
+    """
+    Returns a receive callable which gives an already read request body again
+
+    :param body: Request body
+    :type body: bytes
+
+    :rtype: callable
+    """
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    return receive
+
+
+async def _respond(send, result):
+    """
+    Sends the result of a request function of bowling.views as result_response() does
+
+    :param result: Status code, rendered JSON content and ETag or None
+    :type result: (int, bytes, str|None)
+    """
+    status, content, etag = result
+    headers = [(b'content-type', b'application/json')]
+
+    if etag is not None:
+        headers.append((b'etag', quote_etag(etag).encode('latin1')))
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
+
+
+def _header(scope, name):
+    """
+    Returns a request header or None
+
+    :param name: Lower case header name
+    :type name: bytes
+
+    :rtype: str|None
+    """
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin1')
+
+    return None
+
+
+def _params(body, content_type):
+    """
+    Parses a form or JSON request body like the parsers of settings_api
+
+    :return: The parameters or None for another content type or an invalid body
+    :rtype: dict|None
+    """
+    content_type = (content_type or '').split(';')[0].strip()
+
+    try:
+        if content_type == 'application/json':
+            params = json.loads(body.decode('utf-8'))
+            return params if isinstance(params, dict) else None
+
+        if content_type == 'application/x-www-form-urlencoded':
+            return dict(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+    except ValueError:
+        return None
+
+    return None
+
+
+def _query(scope):
+    """
+    Returns the query string parameters, the last value of a repeated one like QueryDict.get()
+
+    :rtype: dict
+    """
+    return dict(parse_qsl(scope['query_string'].decode('latin1'), keep_blank_values=True))
+
+
+async def get_game(scope, receive, send, request):
+    """
+    Returns game information
+    Params: {game: id, since: int (optional), view: frames|summary (optional)}
+    or {game: id,id,..., view: frames|summary (optional)} for many games
+
+    :param request: Measurements of the request from metrics.new_request()
+    :type request: dict
+
+    :return: False if the request was passed to Django, which records its metrics
+    :rtype: bool
+    """
+    await _respond(send, await _game_info(request, _query(scope), _header(scope, b'if-none-match')))
+
+    return True
+
+
+async def get_roll(scope, receive, send, request):
+    """
+    Returns the legal range of the next roll
+    Params: {game: id}
+    """
+    await _respond(send, await _next_roll_info(request, _query(scope)))
+
+    return True
+
+
+async def post_roll(scope, receive, send, request):
+    """
+    Adds a roll to the game.
+    Params {game: int, roll: int, since: int (optional)}
+    """
+    body = await _read_body(receive)
+    params = _params(body, _header(scope, b'content-type'))
+
+    if params is None:
+        # Let the Django parsers report the invalid body
+        await wsgi_application(scope, _replay(body), send)
+        return False
+
+    await _respond(send, await _add_roll(request, params))
+
+    return True
+
+
+async def _disconnected(receive):
+    """
+    Waits until the client disconnects
+    """
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_game(scope, receive, send, pk):
+    """
+    Streams the game score as Server-Sent Events like GameStreamView
+    Params: Last-Event-ID header (optional)
+    """
+    start = time.perf_counter()
+    request = metrics.new_request()
+    since = last_event_id(_header(scope, b'last-event-id'))
+    pubsub = get_pubsub()
+    # Subscribe before reading the game so no roll is missed
+    subscription = pubsub.subscribe(pk)
+    disconnected = asyncio.ensure_future(_disconnected(receive))
+
+    async def write(content):
+        await send({'type': 'http.response.body', 'body': content, 'more_body': True})
+
+    try:
+        game = await _get_game(request, pk)
+
+        if game is None:
+            await _respond(send, error_result(GAME_NOT_FOUND))
+            metrics.record_request(STREAM_ENDPOINT, time.perf_counter() - start, request)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')],
+        })
+        # Like MetricsMiddleware for GameStreamView the latency is the time until the stream starts
+        metrics.record_request(STREAM_ENDPOINT, time.perf_counter() - start, request)
+
+        timeout = False
+        written = time.monotonic()
+
+        while not disconnected.done():
+            if since != game.rolls_count:
+                try:
+                    await write(score_event(game, since))
+                except ValidationError as e:
+                    await write(event('error', e.detail))
+                    break
+
+                since = game.rolls_count
+                written = time.monotonic()
+            elif timeout and time.monotonic() - written >= settings.STREAM_HEARTBEAT:
+                await write(HEARTBEAT)
+                written = time.monotonic()
+
+            if finished(game.state):
+                break
+
+            rolls_count = None
+
+            # Skip the messages about rolls already sent. A timeout reads the game again
+            # so the stream also gets the rolls published by another process.
+            while not disconnected.done():
+                message = asyncio.ensure_future(subscription.aget(settings.STREAM_POLL))
+                await asyncio.wait([message, disconnected], return_when=asyncio.FIRST_COMPLETED)
+
+                if not message.done():
+                    # Let the cancelled wait remove its wakeup before the stream ends
+                    message.cancel()
+                    await asyncio.wait([message])
+                    break
+
+                rolls_count = message.result()
+
+                if rolls_count is None or rolls_count > since:
+                    break
+
+            timeout = rolls_count is None
+
+            if not disconnected.done():
+                game = await _get_game(metrics.new_request(), pk)
+
+                if game is None:
+                    break
+
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnected.cancel()
+        pubsub.unsubscribe(subscription)
+
+
+# The async handlers and their metrics endpoint labels, named like the Django URLs, by (method, path)
+handlers = {
+    ('GET', '/game/'): (get_game, 'GET game'),
+    ('GET', '/roll/'): (get_roll, 'GET roll'),
+    ('POST', '/roll/'): (post_roll, 'POST roll'),
+}
+
+# Metrics endpoint label of the score streams
+STREAM_ENDPOINT = 'GET game-stream'
+
+# The score stream path with the game id
+STREAM_PATH = re.compile(r'^/game/(\d+)/stream/?$')
+
+
+async def application(scope, receive, send):
+    """
+    ASGI application serving the hot endpoints with async handlers and everything else with Django
+    """
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    metrics.share(settings.METRICS_DIR)
+    stream = STREAM_PATH.match(scope.get('path', ''))
+
+    if stream and scope.get('method') == 'GET':
+        return await stream_game(scope, receive, send, int(stream.group(1)))
+
+    handler = handlers.get((scope.get('method'), scope.get('path')))
+
+    if handler is None:
+        return await wsgi_application(scope, receive, send)
+
+    handler, endpoint = handler
+    start = time.perf_counter()
+    request = metrics.new_request()
+
+    # Recorded like MetricsMiddleware records the requests served by Django
+    if await handler(scope, receive, send, request):
+        metrics.record_request(endpoint, time.perf_counter() - start, request)
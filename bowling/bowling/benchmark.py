@@ -0,0 +1,331 @@
+"""
+Micro-benchmarks of the scoring engine.
+
+Run with python manage.py benchmark_score or python -m bowling.benchmark from the project directory.
+The results are compared with a baseline JSON file and a workload slower or allocating more
+than the tolerance fails the run.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from .score import FRAME_ENGINE, INITIAL_STATE, MAX_PINS, MEMO_ENGINE, TABLE_ENGINE, PrefixMemo, advance, finished, \
+    generate, pins_left, summarize
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Runs merged into a saved baseline, a baseline from a single lucky run fails on the normal noise
+BASELINE_RUNS = 3
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest rank percentile
+
+    :param values: Sorted values
+    :type values: list[float]
+
+    :param percent: Percentile from 0 to 100
+    :type percent: float
+
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, max(0, int(round(percent / 100.0 * len(values))) - 1))]
+
+
+def random_game(rng):
+    """
+    Returns the rolls of a random legal game
+
+    :param rng: Random generator
+    :type rng: random.Random
+
+    :rtype: list[int]
+    """
+    state = INITIAL_STATE
+    rolls = []
+
+    while not finished(state):
+        roll = rng.randint(0, pins_left(state))
+        state = advance(state, roll)
+        rolls.append(roll)
+
+    return rolls
+
+
+def workloads(games=100, seed=0):
+    """
+    Returns the benchmarked games by workload
+
+    :param games: Number of random games and prefixes
+    :type games: int
+
+    :param seed: Seed of the random games
+    :type seed: int
+
+    :rtype: OrderedDict[str, list[list[int]]]
+    """
+    rng = random.Random(seed)
+    random_games = [random_game(rng) for _ in range(games)]
+    spares = [(frame % (MAX_PINS - 1)) + 1 for frame in range(10)]
+
+    return OrderedDict([
+        ('perfect', [[MAX_PINS] * 12]),
+        ('gutter', [[0] * 20]),
+        ('spare-heavy', [[roll for first in spares for roll in (first, MAX_PINS - first)] + [5]]),
+        ('random', random_games),
+        ('prefix', [rolls[:rng.randint(1, len(rolls) - 1)] for rolls in random_games]),
+    ])
+
+
+def _advance(rolls):
+    """
+    Scores the rolls one by one with advance() like Game.add_roll() does
+    """
+    state = INITIAL_STATE
+
+    for roll in rolls:
+        state = advance(state, roll)
+
+    return state
+
+
+def measure(games, function, number, repeat=5):
+    """
+    Measures a scoring function on the games of a workload.
+    The calls per second are from the fastest repeat like timeit recommends, the slower ones are noise.
+
+    :param games: Rolls of each game
+    :type games: list[list[int]]
+
+    :param function: Function called with the rolls of a game
+    :type function: callable
+
+    :param number: Number of calls per repeat
+    :type number: int
+
+    :param repeat: Number of repeats
+    :type repeat: int
+
+    :return: Calls per second, per roll latency percentiles in microseconds and peak traced memory in bytes
+    :rtype: dict
+    """
+    latencies = []
+    ops = 0.0
+
+    for _ in range(repeat):
+        elapsed = 0.0
+
+        for index in range(number):
+            rolls = games[index % len(games)]
+            start = time.perf_counter()
+            function(rolls)
+            seconds = time.perf_counter() - start
+
+            elapsed += seconds
+            latencies.append(seconds / max(1, len(rolls)) * 1e6)
+
+        ops = max(ops, number / elapsed)
+
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        for rolls in games:
+            function(rolls)
+
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops': ops,
+        'p50_us': percentile(latencies, 50),
+        'p95_us': percentile(latencies, 95),
+        'p99_us': percentile(latencies, 99),
+        'peak_bytes': peak,
+    }
+
+
+def run(number=1000, games=100, seed=0):
+    """
+    Benchmarks generate() with each engine, the add_roll() path and summarize() on every workload
+
+    :param number: Number of calls per benchmark
+    :type number: int
+
+    :return: Results by 'function/workload'
+    :rtype: OrderedDict[str, dict]
+    """
+    # Warmed up by the first calls like the memo of a worker process
+    memo = PrefixMemo()
+    functions = OrderedDict([
+        ('generate-frame', lambda rolls: generate(rolls, FRAME_ENGINE)),
+        ('generate-table', lambda rolls: generate(rolls, TABLE_ENGINE)),
+        ('generate-memo', lambda rolls: generate(rolls, MEMO_ENGINE, memo)),
+        ('advance', _advance),
+        ('summarize', summarize),
+    ])
+    # Build the transition table before measuring
+    generate([], TABLE_ENGINE)
+
+    results = OrderedDict()
+
+    for workload, rolls in workloads(games, seed).items():
+        for name, function in functions.items():
+            results['%s/%s' % (name, workload)] = measure(rolls, function, number)
+
+    return results
+
+
+def slowest(runs):
+    """
+    Merges the results of several runs keeping the worst value of each measurement
+
+    :param runs: Results from run()
+    :type runs: list[dict]
+
+    :rtype: OrderedDict[str, dict]
+    """
+    merged = OrderedDict()
+
+    for name in runs[0]:
+        merged[name] = {
+            key: min(results[name][key] for results in runs) if key == 'ops' else max(
+                results[name][key] for results in runs
+            ) for key in runs[0][name]
+        }
+
+    return merged
+
+
+def compare(results, baseline, tolerance=0.3):
+    """
+    Compares the results with a baseline
+
+    :param results: Results from run()
+    :type results: dict
+
+    :param baseline: Results from an earlier run()
+    :type baseline: dict
+
+    :param tolerance: Allowed relative slowdown or memory growth
+    :type tolerance: float
+
+    :return: Description of each regression
+    :rtype: list[str]
+    """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        expected = baseline[name]
+
+        if result['ops'] < expected['ops'] * (1 - tolerance):
+            regressions.append("%s: %.0f ops/s, the baseline is %.0f ops/s" % (name, result['ops'], expected['ops']))
+
+        if result['peak_bytes'] > expected['peak_bytes'] * (1 + tolerance):
+            regressions.append("%s: peak %d bytes, the baseline is %d bytes" % (
+                name, result['peak_bytes'], expected['peak_bytes']
+            ))
+
+    return regressions
+
+
+def report(results):
+    """
+    Formats the results as a table
+
+    :rtype: list[str]
+    """
+    lines = ['%-28s %12s %9s %9s %9s %11s' % ('Benchmark', 'ops/s', 'p50 us', 'p95 us', 'p99 us', 'peak bytes')]
+
+    for name, result in results.items():
+        lines.append('%-28s %12.0f %9.2f %9.2f %9.2f %11d' % (
+            name, result['ops'], result['p50_us'], result['p95_us'], result['p99_us'], result['peak_bytes']
+        ))
+
+    return lines
+
+
+def add_arguments(parser):
+    """
+    Adds the options of check() to the parser of main() or of the benchmark_score command
+
+    :type parser: argparse.ArgumentParser
+    """
+    parser.add_argument('--number', type=int, default=1000, help='Number of calls per benchmark repeat')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed relative regression')
+    parser.add_argument('--save', action='store_true', help='Save the slowest of %d runs as the new baseline' % BASELINE_RUNS)
+
+
+def check(number=1000, baseline=BASELINE, tolerance=0.3, save=False, write=print):
+    """
+    Runs the benchmarks and writes their report, then saves them as the new baseline or compares them with it
+
+    :param number: Number of calls per benchmark repeat
+    :type number: int
+
+    :param baseline: Baseline JSON file
+    :type baseline: str
+
+    :param tolerance: Allowed relative slowdown or memory growth
+    :type tolerance: float
+
+    :param save: Save the slowest of BASELINE_RUNS runs as the new baseline
+    :type save: bool
+
+    :param write: Called with each line of the output
+    :type write: callable
+
+    :return: Description of each failure, a regression or a missing baseline
+    :rtype: list[str]
+    """
+    results = run(number)
+
+    for line in report(results):
+        write(line)
+
+    if save:
+        results = slowest([results] + [run(number) for _ in range(BASELINE_RUNS - 1)])
+
+        with open(baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+
+        write('Saved the baseline %s' % baseline)
+        return []
+
+    if not os.path.exists(baseline):
+        return ['No baseline %s, run with --save to create it' % baseline]
+
+    with open(baseline) as baseline_file:
+        return compare(results, json.load(baseline_file), tolerance)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the scoring engine against a baseline')
+    add_arguments(parser)
+    options = parser.parse_args(argv)
+
+    failures = check(options.number, options.baseline, options.tolerance, options.save)
+
+    for failure in failures:
+        print('FAILED %s' % failure)
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.core.cache import caches
+
+# Hits and misses of the score cache in this process
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _key(game, rolls_count):
+    """
+    Returns the cache key for a game score
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+
+    :rtype: str
+    """
+    return 'bowling:score:%d:%d' % (game, rolls_count)
+
+
+def get_score(game, rolls_count):
+    """
+    Returns the rendered JSON score of a game if it's cached
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+
+    :rtype: bytes|None
+    """
+    content = caches[settings.SCORE_CACHE].get(_key(game, rolls_count))
+    _stats['misses' if content is None else 'hits'] += 1
+
+    return content
+
+
+def set_score(game, rolls_count, content):
+    """
+    Caches the rendered JSON score of a game
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+
+    :param content: Rendered JSON score
+    :type content: bytes
+    """
+    caches[settings.SCORE_CACHE].set(_key(game, rolls_count), content, settings.SCORE_CACHE_TIMEOUT)
+
+
+def delete_score(game, rolls_count):
+    """
+    Removes a cached score of a game which is not up to date anymore
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+    """
+    caches[settings.SCORE_CACHE].delete(_key(game, rolls_count))
+
+
+def stats():
+    """
+    Returns the hits and misses of the score cache in this process
+    :rtype: dict
+    """
+    return dict(_stats)
@@ -0,0 +1,10 @@
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+
+class Conflict(ValidationError):
+    """
+    The game was changed by another request after it was read.
+    It's a ValidationError so the views return it as any other game error but with 409 status code.
+    """
+    status_code = status.HTTP_409_CONFLICT
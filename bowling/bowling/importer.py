@@ -0,0 +1,291 @@
+"""
+Streaming import of historical games.
+
+The games are read one by one from JSONL (a {"rolls": [int]} object or a list of rolls per line) or CSV
+(the rolls of a game per row) and validated with the scoring engine. The valid ones are written with
+bulk_create in chunks, several chunks per transaction, so only one chunk is in memory at a time.
+The rejected games are written to a separate JSONL file with their line number and the error.
+
+The game ids are allocated by the import so the Roll rows can be created without reading them back.
+Each transaction locks the creation of games by the other connections (see lock_games()) before it reads
+the last id, and moves the database sequence after its games like loaddata does before it commits,
+so the API can keep creating games during an import.
+"""
+
+import csv
+import json
+import time
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import Game, Roll, pack_rolls
+from .score import INITIAL_STATE, MAX_PINS, advance, finished
+
+JSONL_FORMAT = 'jsonl'
+CSV_FORMAT = 'csv'
+FORMATS = (JSONL_FORMAT, CSV_FORMAT)
+
+
+def read_records(source, format):
+    """
+    Reads the records of the games one by one
+
+    :param source: Open text file
+    :type source: io.TextIOBase
+
+    :param format: JSONL_FORMAT or CSV_FORMAT
+    :type format: str
+
+    :return: Line number and the record, a line for JSONL or a list of cells for CSV
+    :rtype: collections.Iterator[(int, str|list[str])]
+    """
+    if format == CSV_FORMAT:
+        reader = csv.reader(source)
+
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, row
+    else:
+        for number, line in enumerate(source, 1):
+            if line.strip():
+                yield number, line
+
+
+def parse_rolls(record, format):
+    """
+    Returns the rolls of a game record
+
+    :param record: Record from read_records()
+    :type record: str|list[str]
+
+    :param format: JSONL_FORMAT or CSV_FORMAT
+    :type format: str
+
+    :rtype: list[int]
+
+    :raises ValueError: If the record has no valid list of rolls
+    """
+    if format == CSV_FORMAT:
+        rolls = [int(cell) for cell in record if cell.strip()]
+    else:
+        data = json.loads(record)
+        rolls = data.get('rolls') if isinstance(data, dict) else data
+
+        if not isinstance(rolls, list) or not all(type(roll) is int for roll in rolls):
+            raise ValueError("A list of rolls is expected!")
+
+    for roll in rolls:
+        if roll < 0 or roll > MAX_PINS:
+            raise ValueError("Invalid pins!")
+
+    return rolls
+
+
+def validate(rolls, require_finished=False):
+    """
+    Scores the rolls of a game with advance() like the API does
+
+    :param rolls: List of rolls
+    :type rolls: list[int]
+
+    :param require_finished: Reject the games which are not finished
+    :type require_finished: bool
+
+    :return: Scoring state of the game after the rolls
+    :rtype: State
+
+    :raises ValueError: If the game is not valid
+    """
+    state = INITIAL_STATE
+
+    for roll in rolls:
+        try:
+            state = advance(state, roll)
+        except Exception as e:
+            raise ValueError(str(e))
+
+    if require_finished and not finished(state):
+        raise ValueError("The game is not finished!")
+
+    return state
+
+
+def valid_games(records, format, rejects, require_finished=False):
+    """
+    Parses and validates the games, the rejected ones are written to rejects as they are found
+
+    :param records: Records from read_records()
+    :type records: collections.Iterable[(int, str|list[str])]
+
+    :param format: JSONL_FORMAT or CSV_FORMAT
+    :type format: str
+
+    :param rejects: Open text file for the rejected games or None
+    :type rejects: io.TextIOBase|None
+
+    :param require_finished: Reject the games which are not finished
+    :type require_finished: bool
+
+    :return: Rolls and scoring state of each valid game, None for each rejected one
+    :rtype: collections.Iterator[(list[int], State)|None]
+    """
+    for number, record in records:
+        try:
+            rolls = parse_rolls(record, format)
+            state = validate(rolls, require_finished)
+        except ValueError as e:
+            if rejects is not None:
+                rejects.write(json.dumps({
+                    'line': number,
+                    'error': str(e),
+                    'record': record.rstrip('\r\n') if format == JSONL_FORMAT else ','.join(record)
+                }) + '\n')
+
+            # The rejected games are counted by the caller
+            yield None
+            continue
+
+        yield rolls, state
+
+
+def _insert(chunk, first_pk, write_rolls):
+    """
+    Writes a chunk of games and their rolls with a bulk_create for each table
+
+    :param chunk: Rolls and scoring state of each game
+    :type chunk: list[(list[int], State)]
+
+    :param first_pk: Id of the first game in the chunk
+    :type first_pk: int
+
+    :param write_rolls: Write a Roll row for each roll
+    :type write_rolls: bool
+
+    :return: Number of written rows
+    :rtype: int
+    """
+    Game.objects.bulk_create([
+        Game(pk=first_pk + index, packed_rolls=pack_rolls(rolls), **state._asdict())
+        for index, (rolls, state) in enumerate(chunk)
+    ])
+
+    if not write_rolls:
+        return len(chunk)
+
+    rows = [
+        Roll(game_id=first_pk + index, seq=seq, roll=roll)
+        for index, (rolls, state) in enumerate(chunk) for seq, roll in enumerate(rolls)
+    ]
+    Roll.objects.bulk_create(rows)
+
+    return len(chunk) + len(rows)
+
+
+def import_games(records, format, chunk_size=500, batch_size=10, write_rolls=False, rejects=None,
+                 require_finished=False, progress=None):
+    """
+    Imports the games streamed from records.
+    Each chunk of chunk_size games is written with bulk_create and batch_size chunks are written per transaction,
+    so a failure rolls back only the current transaction.
+
+    :param records: Records from read_records()
+    :type records: collections.Iterable[(int, str|list[str])]
+
+    :param format: JSONL_FORMAT or CSV_FORMAT
+    :type format: str
+
+    :param chunk_size: Games per bulk_create
+    :type chunk_size: int
+
+    :param batch_size: Chunks per transaction
+    :type batch_size: int
+
+    :param write_rolls: Write a Roll row for each roll
+    :type write_rolls: bool
+
+    :param rejects: Open text file for the rejected games or None
+    :type rejects: io.TextIOBase|None
+
+    :param require_finished: Reject the games which are not finished
+    :type require_finished: bool
+
+    :param progress: Called with the report so far after each transaction
+    :type progress: callable|None
+
+    :return: Imported games, rejected games, written rows, seconds and rows per second
+    :rtype: dict
+    """
+    report = {'games': 0, 'rejected': 0, 'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    start = time.perf_counter()
+    games = valid_games(records, format, rejects, require_finished)
+    more = True
+
+    while more:
+        with transaction.atomic():
+            lock_games()
+            next_pk = (Game.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+            for _ in range(batch_size):
+                chunk = []
+
+                # Read until the chunk is full, the rejected games are already written
+                for game in games:
+                    if game is None:
+                        report['rejected'] += 1
+                        continue
+
+                    chunk.append(game)
+
+                    if len(chunk) == chunk_size:
+                        break
+                else:
+                    more = False
+
+                if chunk:
+                    report['rows'] += _insert(chunk, next_pk, write_rolls)
+                    report['games'] += len(chunk)
+                    next_pk += len(chunk)
+
+                if not more:
+                    break
+
+            # Before the lock is released so the API does not create a game with an imported id
+            reset_sequences()
+
+        report['seconds'] = time.perf_counter() - start
+        report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] else 0.0
+
+        if progress is not None:
+            progress(report)
+
+    return report
+
+
+def lock_games():
+    """
+    Blocks the creation of games by the other connections until the end of the transaction
+    so they do not take the ids allocated by the import
+    """
+    table = connection.ops.quote_name(Game._meta.db_table)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Conflicts with the INSERT and UPDATE of the other transactions, the reads go on
+            cursor.execute('LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE' % table)
+        elif connection.vendor == 'mysql':
+            # The next-key lock on the last game blocks the inserts after it
+            cursor.execute('SELECT id FROM %s ORDER BY id DESC LIMIT 1 FOR UPDATE' % table)
+        elif connection.vendor == 'sqlite':
+            # The first write of a transaction locks the database for the other writers
+            cursor.execute('UPDATE %s SET id = id WHERE 0' % table)
+
+
+def reset_sequences():
+    """
+    Moves the game id sequence after the imported games so the API creates new ids
+    """
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Game]):
+            cursor.execute(sql)
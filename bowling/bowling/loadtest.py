@@ -0,0 +1,324 @@
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from .benchmark import percentile, random_game
+
+HOST = '127.0.0.1'
+
+# Commands starting each server on a local port, the WSGI deployment as in gunicorn.conf
+SERVERS = {
+    'wsgi': lambda port, workers: [
+        sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+        '--bind', '%s:%d' % (HOST, port), 'bowling.wsgi_api:application'
+    ],
+    'asgi': lambda port, workers: [
+        sys.executable, '-m', 'uvicorn', '--workers', str(workers), '--no-access-log',
+        '--host', HOST, '--port', str(port), 'bowling.asgi:application'
+    ],
+}
+
+
+def free_port():
+    """
+    Returns a free local TCP port
+
+    :rtype: int
+    """
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _environment(database):
+    """
+    Returns the environment of the processes using the load test database
+
+    :param database: Path to the SQLite database file
+    :type database: str
+
+    :rtype: dict
+    """
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = 'bowling.settings_loadtest'
+    env['BOWLING_LOADTEST_DATABASE'] = database
+
+    return env
+
+
+def migrate(database):
+    """
+    Creates a new load test database
+
+    :param database: Path to the SQLite database file
+    :type database: str
+    """
+    if os.path.exists(database):
+        os.remove(database)
+
+    subprocess.check_call(
+        [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'migrate', '--noinput', '-v', '0'],
+        cwd=settings.BASE_DIR,
+        env=_environment(database)
+    )
+
+
+@contextmanager
+def serve(server, database, workers=1, timeout=30):
+    """
+    Starts a server with the load test settings on a free local port and stops it on exit
+
+    :param server: Server name from SERVERS
+    :type server: str
+
+    :param database: Path to a migrated SQLite database file
+    :type database: str
+
+    :param workers: Number of worker processes
+    :type workers: int
+
+    :param timeout: Seconds to wait for the server to accept connections
+    :type timeout: float
+
+    :return: The server port
+    :rtype: int
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        SERVERS[server](port, workers),
+        cwd=settings.BASE_DIR,
+        env=_environment(database),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE
+    )
+
+    try:
+        deadline = time.time() + timeout
+
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("The %s server exited:\n%s" % (server, process.stderr.read().decode('utf-8')))
+
+            try:
+                socket.create_connection((HOST, port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("The %s server did not start in %d seconds" % (server, timeout))
+
+                time.sleep(0.1)
+
+        yield port
+    finally:
+        process.terminate()
+        process.communicate()
+
+
+class Client(object):
+    """
+    HTTP client keeping one connection to the server and recording the latency of each request by endpoint
+    """
+    def __init__(self, port):
+        self.port = port
+        self.connection = http.client.HTTPConnection(HOST, port, timeout=60)
+        self.requests = {}
+        self.latencies = {}
+        self.errors = {}
+        # Headers of the last response
+        self.last_headers = []
+
+    def request(self, method, path, params, headers=None):
+        """
+        Sends a request and records its latency under 'METHOD path'
+
+        :param params: Query parameters for GET, form fields otherwise
+        :type params: dict
+
+        :param headers: Additional request headers
+        :type headers: dict|None
+
+        :return: Response status and parsed JSON content or None on a connection error
+        :rtype: (int, dict|list|None)
+        """
+        endpoint = '%s %s' % (method, path)
+        body = None
+        headers = dict(headers or {})
+
+        if method == 'GET':
+            path = '%s?%s' % (path, urlencode(params))
+        else:
+            body = urlencode(params)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        start = time.perf_counter()
+
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return 0, None
+
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+
+        if response.status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+        self.last_headers = response.getheaders()
+
+        try:
+            return response.status, json.loads(content.decode('utf-8')) if content else None
+        except ValueError:
+            return response.status, None
+
+
+def tournament(bowlers, games=1, think=0.0, poll=0.05, seed=0):
+    """
+    Returns work for run() simulating a tournament: the first bowlers clients create games and roll
+    random legal games while the other clients are spectators polling the score of the games being played.
+    The spectators send the ETag of the score they have, like a browser does, and stop when all the games are over.
+
+    :param bowlers: Number of bowler clients
+    :type bowlers: int
+
+    :param games: Number of games played by each bowler one after another
+    :type games: int
+
+    :param think: Seconds a bowler waits between the rolls
+    :type think: float
+
+    :param poll: Seconds a spectator waits between the polls
+    :type poll: float
+
+    :param seed: Seed of the random games
+    :type seed: int
+
+    :rtype: callable
+    """
+    playing = []
+    done = threading.Event()
+    remaining = [bowlers]
+    lock = threading.Lock()
+
+    if not bowlers:
+        done.set()
+
+    def bowler(client, index):
+        rng = random.Random(seed + index)
+
+        for _ in range(games):
+            status, content = client.request('POST', '/game/', {})
+
+            if status != 200:
+                continue
+
+            with lock:
+                playing.append(content['game'])
+
+            for roll in random_game(rng):
+                time.sleep(think)
+                client.request('POST', '/roll/', {'game': content['game'], 'roll': roll})
+
+    def spectator(client, index):
+        rng = random.Random(seed + index)
+        etags = {}
+
+        while not done.is_set():
+            time.sleep(poll)
+
+            with lock:
+                game = rng.choice(playing) if playing else None
+
+            if game is None:
+                continue
+
+            headers = {'If-None-Match': etags[game]} if game in etags else {}
+            status, content = client.request('GET', '/game/', {'game': game}, headers)
+            etag = dict((name.lower(), value) for name, value in client.last_headers).get('etag')
+
+            if etag:
+                etags[game] = etag
+
+    def work(client, index):
+        if index >= bowlers:
+            return spectator(client, index)
+
+        try:
+            bowler(client, index)
+        finally:
+            with lock:
+                remaining[0] -= 1
+
+                if not remaining[0]:
+                    done.set()
+
+    return work
+
+
+def run(port, concurrency, work):
+    """
+    Runs the work in concurrent clients and merges their measurements
+
+    :param port: Server port
+    :type port: int
+
+    :param concurrency: Number of concurrent clients, each in its own thread
+    :type concurrency: int
+
+    :param work: Function called with the Client and the client index
+    :type work: callable
+
+    :return: Per endpoint dict with requests, errors, throughput and latency percentiles in seconds
+    :rtype: dict
+    """
+    clients = [Client(port) for _ in range(concurrency)]
+    threads = [threading.Thread(target=work, args=(client, index)) for index, client in enumerate(clients)]
+
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    seconds = time.perf_counter() - start
+    endpoints = sorted(set(endpoint for client in clients for endpoint in client.requests))
+    report = {}
+
+    for endpoint in endpoints:
+        latencies = sorted(latency for client in clients for latency in client.latencies.get(endpoint, []))
+
+        report[endpoint] = {
+            'requests': sum(client.requests.get(endpoint, 0) for client in clients),
+            'errors': sum(client.errors.get(endpoint, 0) for client in clients),
+            'throughput': len(latencies) / seconds,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+    return report
+
+
+def database_path(name):
+    """
+    Returns the path of a load test database in the temporary directory
+
+    :rtype: str
+    """
+    return os.path.join(tempfile.gettempdir(), 'bowling_loadtest_%s.sqlite3' % name)
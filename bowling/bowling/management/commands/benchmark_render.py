@@ -0,0 +1,37 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from bowling import renderers
+from bowling.renderers import FastJSONRenderer
+from bowling.score import generate
+from bowling.serializers import ScoreSerializer, score_data
+
+# Rolls of a completed game with strikes, spares and open frames
+ROLLS = [1, 4, 4, 5, 6, 4, 5, 5, 10, 0, 1, 7, 3, 6, 4, 10, 2, 8, 6]
+
+
+class Command(BaseCommand):
+    help = 'Compares the cost of rendering a game score with the DRF serializers and with the fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=10000, help='Number of responses rendered by each path')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        frames = generate(ROLLS)
+
+        paths = [
+            ('DRF ScoreSerializer + JSONRenderer',
+             lambda: JSONRenderer().render(ScoreSerializer({'game': 1, 'score': frames}).data)),
+            ('score_data + FastJSONRenderer (%s)' % ('orjson' if renderers.orjson else 'json'),
+             lambda: FastJSONRenderer().render(score_data(1, frames))),
+        ]
+
+        baseline = None
+
+        for name, render in paths:
+            cost = timeit.timeit(render, number=number) / number * 1e6
+            baseline = baseline or cost
+            self.stdout.write('%-45s %8.1f us/response %6.1fx' % (name, cost, baseline / cost))
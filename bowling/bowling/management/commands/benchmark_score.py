@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bowling.benchmark import add_arguments, check
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the scoring engine on several workloads and fails on regressions against the baseline'
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        failures = check(options['number'], options['baseline'], options['tolerance'], options['save'],
+                         self.stdout.write)
+
+        if failures:
+            raise CommandError('Benchmark failed:\n%s' % '\n'.join(failures))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+
+from bowling.loadtest import database_path, migrate, run, serve
+
+# Rolls of an open game, each client plays it again and again
+ROLLS = [3, 4] * 10
+
+
+def scoreboard(requests):
+    """
+    Returns work for loadtest.run() where each client adds rolls to its game
+    and polls the score after each roll
+
+    :param requests: Number of rolls added by each client
+    :type requests: int
+
+    :rtype: callable
+    """
+    def work(client, index):
+        game = None
+
+        for number in range(requests):
+            if number % len(ROLLS) == 0:
+                status, content = client.request('POST', '/game/', {})
+                game = content['game'] if status == 200 else None
+
+            if game is None:
+                continue
+
+            client.request('POST', '/roll/', {'game': game, 'roll': ROLLS[number % len(ROLLS)]})
+            client.request('GET', '/game/', {'game': game})
+
+    return work
+
+
+class Command(BaseCommand):
+    help = 'Compares the throughput and latency of the WSGI and the ASGI deployment at several concurrency levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='1,10,50', help='Comma separated numbers of concurrent clients')
+        parser.add_argument('--requests', type=int, default=100, help='Number of rolls added by each client')
+        parser.add_argument('--wsgi-workers', type=int, default=3, help='Number of gunicorn sync workers')
+        parser.add_argument('--asgi-workers', type=int, default=1, help='Number of uvicorn workers')
+
+    def handle(self, *args, **options):
+        workers = {'wsgi': options['wsgi_workers'], 'asgi': options['asgi_workers']}
+
+        self.stdout.write('%-6s %11s %-12s %9s %7s %10s %10s %10s' % (
+            'Server', 'Concurrency', 'Endpoint', 'Requests', 'Errors', 'Req/s', 'p50 ms', 'p99 ms'
+        ))
+
+        for concurrency in [int(value) for value in options['concurrency'].split(',')]:
+            for server in ('wsgi', 'asgi'):
+                database = database_path(server)
+                migrate(database)
+
+                with serve(server, database, workers[server]) as port:
+                    report = run(port, concurrency, scoreboard(options['requests']))
+
+                for endpoint, result in sorted(report.items()):
+                    self.stdout.write('%-6s %11d %-12s %9d %7d %10.1f %10.2f %10.2f' % (
+                        server, concurrency, endpoint, result['requests'], result['errors'],
+                        result['throughput'], result['p50'] * 1000, result['p99'] * 1000
+                    ))
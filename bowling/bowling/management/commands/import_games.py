@@ -0,0 +1,53 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bowling.importer import CSV_FORMAT, FORMATS, JSONL_FORMAT, import_games, read_records
+
+
+class Command(BaseCommand):
+    help = 'Imports historical games streamed from a JSONL or CSV file or stdin with bulk_create, ' \
+           'validating each game with the scoring engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV file, - for stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format, by default from the file extension or jsonl for stdin')
+        parser.add_argument('--chunk', type=int, default=500, help='Games per bulk_create')
+        parser.add_argument('--batch', type=int, default=10, help='Chunks per transaction')
+        parser.add_argument('--rejects', help='Write the rejected games to this JSONL file')
+        parser.add_argument('--rolls', action='store_true',
+                            help='Also write a Roll row for each roll, always done when ROLL_AUDIT is enabled')
+        parser.add_argument('--finished', action='store_true', help='Reject the games which are not finished')
+
+    def handle(self, *args, **options):
+        if options['chunk'] < 1 or options['batch'] < 1:
+            raise CommandError('The chunk and the batch need at least one game')
+
+        path = options['path']
+        format = options['format'] or (CSV_FORMAT if path.lower().endswith('.csv') else JSONL_FORMAT)
+        source = sys.stdin if path == '-' else open(path, newline='')
+        rejects = open(options['rejects'], 'w') if options['rejects'] else None
+
+        def progress(report):
+            if options['verbosity'] >= 2:
+                self.stdout.write('%d games, %d rejected, %d rows, %.0f rows/s' % (
+                    report['games'], report['rejected'], report['rows'], report['rows_per_second']
+                ))
+
+        try:
+            report = import_games(
+                read_records(source, format), format, options['chunk'], options['batch'],
+                options['rolls'] or settings.ROLL_AUDIT, rejects, options['finished'], progress
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+            if rejects is not None:
+                rejects.close()
+
+        self.stdout.write('Imported %d games (%d rows) in %.2fs, %.0f rows/s, %d rejected' % (
+            report['games'], report['rows'], report['seconds'], report['rows_per_second'], report['rejected']
+        ))
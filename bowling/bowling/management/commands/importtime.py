@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bowling.startup import measure, summarize
+
+
+class Command(BaseCommand):
+    help = 'Reports how long importing the WSGI application takes in a new process against STARTUP_BUDGET and its memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='bowling.wsgi_api', help='Module to import')
+        parser.add_argument('--top', type=int, default=10, help='Number of the slowest packages and modules')
+
+    def handle(self, *args, **options):
+        result = measure(options['module'])
+
+        self.stdout.write('Importing %s took %.0f ms, the budget is %.0f ms' % (
+            options['module'],
+            result['seconds'] * 1000,
+            settings.STARTUP_BUDGET * 1000
+        ))
+        self.stdout.write('Resident memory after the import: %.1f MB' % (result['rss_bytes'] / 1024.0 / 1024.0))
+
+        if result['connections']:
+            self.stdout.write('Database connections opened on import: %s' % ', '.join(result['connections']))
+
+        if result['importtime']:
+            packages, modules = summarize(result['importtime'], options['top'])
+
+            self.stdout.write('\nSlowest packages (self time):')
+            for name, microseconds in packages:
+                self.stdout.write('  %-40s %8.1f ms' % (name, microseconds / 1000.0))
+
+            self.stdout.write('\nSlowest modules (self time):')
+            for name, microseconds in modules:
+                self.stdout.write('  %-40s %8.1f ms' % (name, microseconds / 1000.0))
+        else:
+            self.stdout.write('-X importtime is not supported by this Python, it needs Python 3.7+')
+
+        if result['seconds'] > settings.STARTUP_BUDGET:
+            raise CommandError('The startup budget is exceeded!')
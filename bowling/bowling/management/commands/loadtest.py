@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bowling.loadtest import SERVERS, database_path, migrate, run, serve, tournament
+
+
+class Command(BaseCommand):
+    help = 'Starts the application on a local port with a new file SQLite database and reports ' \
+           'the throughput, latency and errors per endpoint of concurrent bowlers and spectators'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', default='wsgi', choices=sorted(SERVERS),
+                            help='wsgi for gunicorn with bowling.wsgi_api, asgi for uvicorn with bowling.asgi')
+        parser.add_argument('--workers', type=int, default=3, help='Number of server worker processes')
+        parser.add_argument('--bowlers', type=int, default=10, help='Number of concurrent bowlers')
+        parser.add_argument('--spectators', type=int, default=20, help='Number of concurrent spectators')
+        parser.add_argument('--games', type=int, default=3, help='Number of games played by each bowler')
+        parser.add_argument('--think', type=float, default=0.0, help='Seconds a bowler waits between the rolls')
+        parser.add_argument('--poll', type=float, default=0.05, help='Seconds a spectator waits between the polls')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random games')
+        parser.add_argument('--json', help='Also write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['bowlers'] < 1:
+            raise CommandError('At least one bowler is needed')
+
+        database = database_path(options['server'])
+        migrate(database)
+
+        with serve(options['server'], database, options['workers']) as port:
+            report = run(port, options['bowlers'] + options['spectators'], tournament(
+                options['bowlers'], options['games'], options['think'], options['poll'], options['seed']
+            ))
+
+        self.stdout.write('%-12s %9s %8s %10s %9s %9s %9s' % (
+            'Endpoint', 'Requests', 'Errors', 'Req/s', 'p50 ms', 'p95 ms', 'p99 ms'
+        ))
+
+        for endpoint, result in sorted(report.items()):
+            self.stdout.write('%-12s %9d %7.1f%% %10.1f %9.2f %9.2f %9.2f' % (
+                endpoint, result['requests'], 100.0 * result['errors'] / max(1, result['requests']),
+                result['throughput'], result['p50'] * 1000, result['p95'] * 1000, result['p99'] * 1000
+            ))
+
+        if options['json']:
+            with open(options['json'], 'w') as output:
+                json.dump(report, output, indent=2, sort_keys=True)
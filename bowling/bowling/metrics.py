@@ -0,0 +1,443 @@
+"""
+Performance metrics of this process rendered in the Prometheus text format.
+
+The request latency, the SQL queries and the scoring time are recorded per endpoint by
+bowling.middleware.MetricsMiddleware, or bowling.asgi for its async handlers, and the instrumented
+functions are timed with @timed.
+
+With several worker processes (eg. gunicorn) a scrape reaches a random worker, so each worker
+writes its metrics to a shared directory with share() and render() sums the histograms of all the
+live workers. The gauges are rendered per live worker with a pid label.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import wraps
+
+# Upper bounds of the histogram buckets in seconds
+SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds of the histogram buckets of the SQL queries per request
+QUERIES_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50)
+
+# The metrics by name in the order they are rendered
+_registry = OrderedDict()
+
+# Measurements of the request handled by the current thread
+_local = threading.local()
+
+# Seconds between the writes of the metrics of this process to the shared directory
+FLUSH_SECONDS = 1.0
+
+# Shared directory of this process, see share()
+_shared = {'directory': None, 'pid': None}
+
+
+class Histogram(object):
+    """
+    Prometheus histogram with a fixed set of label names
+    """
+    def __init__(self, name, help, buckets, labels):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        # Bucket counts, sum and count by label values
+        self._values = {}
+
+        _registry[name] = self
+
+    def observe(self, value, *labels):
+        """
+        Records a value
+
+        :param value: Measured value
+        :type value: float
+
+        :param labels: Values of the labels in order
+        :type labels: str
+        """
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            values = self._values.get(labels)
+
+            if values is None:
+                values = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            values[0][index] += 1
+            values[1] += value
+            values[2] += 1
+
+    def snapshot(self):
+        """
+        Returns a copy of the recorded values
+
+        :return: Bucket counts, sum and count by label values
+        :rtype: dict[tuple, (list[int], float, int)]
+        """
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+
+    def render(self, values=None):
+        """
+        Renders the histogram in the Prometheus text format
+
+        :param values: Values from snapshot() to render instead of the values of this process
+        :type values: dict|None
+
+        :rtype: list[str]
+        """
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        values = sorted((self.snapshot() if values is None else values).items())
+
+        for labels, (counts, total, count) in values:
+            pairs = ['%s="%s"' % (name, value) for name, value in zip(self.labels, labels)]
+            cumulative = 0
+
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append('%s_bucket{%s} %d' % (self.name, ','.join(pairs + ['le="%s"' % bound]), cumulative))
+
+            lines.append('%s_sum{%s} %r' % (self.name, ','.join(pairs), total))
+            lines.append('%s_count{%s} %d' % (self.name, ','.join(pairs), count))
+
+        return lines
+
+    def clear(self):
+        """
+        Removes all the recorded values
+        """
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(object):
+    """
+    Prometheus gauge read from a function when the metrics are rendered
+    """
+    def __init__(self, name, help, function):
+        self.name = name
+        self.help = help
+        self.function = function
+
+        _registry[name] = self
+
+    def snapshot(self):
+        """
+        Returns the current value
+        :rtype: float
+        """
+        return self.function()
+
+    def render(self, values=None):
+        """
+        Renders the gauge in the Prometheus text format
+
+        :param values: Values from snapshot() by process id to render instead of the value of this process
+        :type values: dict[int, float]|None
+
+        :rtype: list[str]
+        """
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s gauge' % self.name]
+
+        if values is None:
+            return lines + ['%s %r' % (self.name, self.snapshot())]
+
+        return lines + ['%s{pid="%d"} %r' % (self.name, pid, value) for pid, value in sorted(values.items())]
+
+    def clear(self):
+        """
+        Gauges have no recorded values
+        """
+
+
+REQUEST_SECONDS = Histogram('bowling_request_seconds', "Request latency", SECONDS_BUCKETS, ('endpoint',))
+SQL_QUERIES = Histogram('bowling_sql_queries', "SQL queries per request", QUERIES_BUCKETS, ('endpoint',))
+SQL_SECONDS = Histogram('bowling_sql_seconds', "SQL time per request", SECONDS_BUCKETS, ('endpoint',))
+SCORE_SECONDS = Histogram('bowling_score_seconds', "Scoring time per request", SECONDS_BUCKETS, ('endpoint',))
+FUNCTION_SECONDS = Histogram('bowling_function_seconds', "Time of the instrumented functions",
+                             SECONDS_BUCKETS, ('function',))
+
+
+def new_request():
+    """
+    Returns empty measurements of a request
+
+    :return: SQL queries, SQL time and scoring time
+    :rtype: dict
+    """
+    return {'queries': 0, 'sql': 0.0, 'score': 0.0, 'scoring': False}
+
+
+def start_request(request=None):
+    """
+    Starts measuring the request handled by the current thread
+
+    :param request: Measurements from new_request() to add to, eg. of an async request which runs
+        its database calls in the threads of a pool, or None for new ones
+    :type request: dict|None
+    """
+    _local.request = new_request() if request is None else request
+
+
+def stop_request():
+    """
+    Stops measuring in the current thread without recording anything
+    """
+    _local.request = None
+
+
+def finish_request(endpoint, seconds):
+    """
+    Records the measurements of the request handled by the current thread
+
+    :param endpoint: Endpoint label, eg. 'POST roll'
+    :type endpoint: str
+
+    :param seconds: Request latency
+    :type seconds: float
+    """
+    request = getattr(_local, 'request', None)
+    _local.request = None
+
+    record_request(endpoint, seconds, request)
+
+
+def record_request(endpoint, seconds, request):
+    """
+    Records the measurements of a request
+
+    :param endpoint: Endpoint label, eg. 'POST roll'
+    :type endpoint: str
+
+    :param seconds: Request latency
+    :type seconds: float
+
+    :param request: Measurements from new_request() or None
+    :type request: dict|None
+    """
+    REQUEST_SECONDS.observe(seconds, endpoint)
+
+    if request is not None:
+        SQL_QUERIES.observe(request['queries'], endpoint)
+        SQL_SECONDS.observe(request['sql'], endpoint)
+        SCORE_SECONDS.observe(request['score'], endpoint)
+
+
+def record_query(seconds):
+    """
+    Adds an SQL query to the request handled by the current thread
+
+    :param seconds: Query time
+    :type seconds: float
+    """
+    request = getattr(_local, 'request', None)
+
+    if request is not None:
+        request['queries'] += 1
+        request['sql'] += seconds
+
+
+def timed(name, scoring=False):
+    """
+    Decorator recording the time of each call of a function.
+    The time of the outermost scoring function is added to the scoring time of the request.
+
+    :param name: Function label
+    :type name: str
+
+    :param scoring: Is the function scoring a game
+    :type scoring: bool
+
+    :rtype: callable
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            request = getattr(_local, 'request', None)
+            outermost = scoring and request is not None and not request['scoring']
+
+            if outermost:
+                request['scoring'] = True
+
+            start = time.perf_counter()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                FUNCTION_SECONDS.observe(seconds, name)
+
+                if outermost:
+                    request['scoring'] = False
+                    request['score'] += seconds
+
+        return wrapper
+
+    return decorator
+
+
+def share(directory):
+    """
+    Writes the metrics of this process to the directory every FLUSH_SECONDS in a thread so render()
+    in any process of the deployment includes them. Called for each request, the thread is started
+    once in each process because the workers are forked after the application is loaded.
+
+    :param directory: Directory shared by the processes or None to keep the metrics in the process
+    :type directory: str|None
+    """
+    pid = os.getpid()
+
+    if _shared['directory'] == directory and _shared['pid'] == pid:
+        return
+
+    _shared.update(directory=directory, pid=pid)
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+        threading.Thread(target=_flush, args=(directory, pid), name='metrics-flush', daemon=True).start()
+
+
+def _flush(directory, pid):
+    """
+    Writes the metrics of the process to the directory until it's not shared anymore or the process is forked
+    """
+    while True:
+        time.sleep(FLUSH_SECONDS)
+
+        if _shared['directory'] != directory or _shared['pid'] != pid:
+            return
+
+        try:
+            dump(directory)
+        except OSError:
+            # Eg. the directory is being emptied, the next flush writes everything again
+            pass
+
+
+def dump(directory):
+    """
+    Writes the metrics of this process to a file named by the process id in the directory
+
+    :param directory: Directory shared by the processes
+    :type directory: str
+    """
+    path = os.path.join(directory, '%d.json' % os.getpid())
+    snapshot = {
+        name: [[list(labels), values] for labels, values in metric.snapshot().items()]
+        if isinstance(metric, Histogram) else metric.snapshot()
+        for name, metric in _registry.items()
+    }
+
+    # Written to its own temporary file and replaced at once, so a reader never sees a partial file
+    # and the flush thread and a scrape can dump at the same time
+    descriptor, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+
+    try:
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(snapshot, output)
+
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def _alive(pid):
+    """
+    Is a process running
+    :rtype: bool
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def load(directory):
+    """
+    Reads the metrics of the live processes from the directory.
+    The files of the ended processes are removed, Prometheus takes the drop of their counters as a reset.
+
+    :param directory: Directory shared by the processes
+    :type directory: str
+
+    :return: Histogram values summed over the live processes and their gauge values by metric name
+    :rtype: dict
+    """
+    merged = {name: {} for name in _registry}
+
+    for filename in os.listdir(directory):
+        pid, extension = os.path.splitext(filename)
+
+        if extension != '.json' or not pid.isdigit():
+            continue
+
+        if not _alive(int(pid)):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except OSError:
+                # Removed by another process
+                pass
+
+            continue
+
+        try:
+            with open(os.path.join(directory, filename)) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+
+        for name, values in snapshot.items():
+            metric = _registry.get(name)
+
+            if isinstance(metric, Histogram):
+                for labels, (counts, total, count) in values:
+                    merged_counts, merged_total, merged_count = merged[name].get(
+                        tuple(labels), ([0] * len(counts), 0.0, 0)
+                    )
+                    merged[name][tuple(labels)] = (
+                        [a + b for a, b in zip(merged_counts, counts)], merged_total + total, merged_count + count
+                    )
+            elif metric is not None:
+                merged[name][int(pid)] = values
+
+    return merged
+
+
+def render(directory=None):
+    """
+    Renders all the metrics in the Prometheus text format
+
+    :param directory: Directory shared by the processes to render the metrics of all of them or None
+    :type directory: str|None
+
+    :rtype: str
+    """
+    if directory is None:
+        return '\n'.join(line for metric in _registry.values() for line in metric.render()) + '\n'
+
+    # The metrics of this process are up to date, the others are at most FLUSH_SECONDS old
+    dump(directory)
+    merged = load(directory)
+
+    return '\n'.join(line for name, metric in _registry.items() for line in metric.render(merged[name])) + '\n'
+
+
+def clear():
+    """
+    Removes all the recorded values
+    """
+    for metric in _registry.values():
+        metric.clear()
@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+class TimedCursor(object):
+    """
+    Cursor wrapper adding the time of each query to the request metrics
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        return self.cursor.__exit__(type, value, traceback)
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.perf_counter()
+
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            metrics.record_query(time.perf_counter() - start)
+
+
+def instrument(connection):
+    """
+    Makes a database connection of the current thread return TimedCursor cursors.
+    Django 1.9 has no execute wrappers so the cursor factories of the connection are wrapped.
+
+    :param connection: Database connection
+    :type connection: django.db.backends.base.base.BaseDatabaseWrapper
+    """
+    if getattr(connection, 'instrumented', False):
+        return
+
+    make_cursor, make_debug_cursor = connection.make_cursor, connection.make_debug_cursor
+    connection.make_cursor = lambda cursor: TimedCursor(make_cursor(cursor))
+    connection.make_debug_cursor = lambda cursor: TimedCursor(make_debug_cursor(cursor))
+    connection.instrumented = True
+
+
+class MetricsMiddleware(object):
+    """
+    Records the latency, the SQL queries and the scoring time of each request by endpoint, see bowling.metrics.
+    It should be the first middleware so the latency includes the others.
+    """
+    def process_request(self, request):
+        request.metrics_start = time.perf_counter()
+
+        for connection in connections.all():
+            instrument(connection)
+
+        metrics.share(settings.METRICS_DIR)
+        metrics.start_request()
+
+    def process_response(self, request, response):
+        start = getattr(request, 'metrics_start', None)
+
+        if start is not None:
+            match = getattr(request, 'resolver_match', None)
+            metrics.finish_request(
+                '%s %s' % (request.method, match.url_name if match else 'unknown'),
+                time.perf_counter() - start
+            )
+
+        return response
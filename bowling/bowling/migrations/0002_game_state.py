@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.5 on 2026-10-18 05:30
+from __future__ import unicode_literals
+
+import logging
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# The scoring rules when this migration was written, a copy of bowling.score.advance() so later changes
+# of the scoring engine do not change it
+MAX_PINS = 10
+MAX_FRAMES = 10
+
+INITIAL_STATE = {
+    'rolls_count': 0, 'frame': 1, 'frame_rolls': 0, 'frame_pins': 0, 'bonus_next': 0, 'bonus_after': 0, 'total': 0
+}
+
+
+def advance(state, roll):
+    """
+    Returns the scoring state after a roll or None if the roll is invalid
+    """
+    if state['frame'] == MAX_FRAMES and (
+            state['frame_rolls'] == 3 or (state['frame_rolls'] == 2 and state['frame_pins'] < MAX_PINS)):
+        return None
+
+    if roll < 0 or roll > MAX_PINS or roll > MAX_PINS - state['frame_pins'] % MAX_PINS:
+        return None
+
+    frame = state['frame']
+    frame_rolls = state['frame_rolls'] + 1
+    frame_pins = state['frame_pins'] + roll
+    bonus_next = state['bonus_after']
+    bonus_after = 0
+
+    if frame < MAX_FRAMES:
+        if frame_pins == MAX_PINS:
+            bonus_next += 1
+            bonus_after += 1 if frame_rolls == 1 else 0
+
+        if frame_pins == MAX_PINS or frame_rolls == 2:
+            frame, frame_rolls, frame_pins = frame + 1, 0, 0
+
+    return {
+        'rolls_count': state['rolls_count'] + 1,
+        'frame': frame,
+        'frame_rolls': frame_rolls,
+        'frame_pins': frame_pins,
+        'bonus_next': bonus_next,
+        'bonus_after': bonus_after,
+        'total': state['total'] + roll * (1 + state['bonus_next'])
+    }
+
+
+def replay_rolls(apps, schema_editor):
+    """
+    Calculates the scoring state of the existing games from their rolls.
+    A game with an invalid roll (eg. entered in the admin) is scored up to its last valid roll and logged.
+    """
+    Game = apps.get_model('bowling', 'Game')
+
+    for game in Game.objects.all():
+        state = INITIAL_STATE
+
+        for roll in game.rolls.order_by('pk').values_list('roll', flat=True):
+            next_state = advance(state, roll)
+
+            if next_state is None:
+                logger.warning("Game %d is scored up to roll %d, roll %d is invalid",
+                               game.pk, state['rolls_count'], roll)
+                break
+
+            state = next_state
+
+        Game.objects.filter(pk=game.pk).update(**state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bowling', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='bonus_after',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='bonus_next',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='frame',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='frame_pins',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='frame_rolls',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rolls_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='total',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(replay_rolls, migrations.RunPython.noop),
+    ]
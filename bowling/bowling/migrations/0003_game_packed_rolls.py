@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.5 on 2026-10-18 05:37
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Characters of the packed rolls when this migration was written, a copy so later changes of
+# bowling.models.pack_rolls() do not change it
+ROLL_CHARS = '0123456789X'
+
+
+def pack_existing_rolls(apps, schema_editor):
+    """
+    Packs the rolls of the existing games from the Roll table.
+    Only the rolls scored by 0002_game_state are packed so the packed rolls match the stored state.
+    """
+    Game = apps.get_model('bowling', 'Game')
+
+    for game in Game.objects.all():
+        rolls = game.rolls.order_by('pk').values_list('roll', flat=True)[:game.rolls_count]
+        game.packed_rolls = ''.join(ROLL_CHARS[roll] for roll in rolls)
+        game.save(update_fields=['packed_rolls'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bowling', '0002_game_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='packed_rolls',
+            field=models.CharField(blank=True, default='', max_length=21),
+        ),
+        migrations.RunPython(pack_existing_rolls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.5 on 2026-10-18 05:37
+from __future__ import unicode_literals
+
+import logging
+
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+
+def number_existing_rolls(apps, schema_editor):
+    """
+    Numbers the existing rolls of each game in the order they were saved.
+    The rolls after the rolls count of the game, not scored by 0002_game_state because one of them is invalid,
+    are deleted and logged, the next roll saved with ROLL_AUDIT takes the position after the rolls count.
+    """
+    Game = apps.get_model('bowling', 'Game')
+    Roll = apps.get_model('bowling', 'Roll')
+    rolls_counts = dict(Game.objects.values_list('pk', 'rolls_count'))
+    game = None
+    seq = 0
+    trimmed = {}
+
+    for roll in Roll.objects.order_by('game', 'pk').only('pk', 'game'):
+        seq = seq + 1 if roll.game_id == game else 0
+        game = roll.game_id
+
+        if seq >= rolls_counts[game]:
+            trimmed.setdefault(game, []).append(roll.pk)
+        else:
+            Roll.objects.filter(pk=roll.pk).update(seq=seq)
+
+    for game, pks in sorted(trimmed.items()):
+        logger.warning("Game %d has %d rolls after its last valid roll, they are deleted", game, len(pks))
+        Roll.objects.filter(pk__in=pks).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bowling', '0003_game_packed_rolls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roll',
+            name='seq',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_existing_rolls, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='roll',
+            unique_together=set([('game', 'seq')]),
+        ),
+    ]
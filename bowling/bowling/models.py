@@ -1,26 +1,209 @@
+from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from rest_framework.exceptions import ValidationError
 
-from .score import MAX_PINS, generate
+from .cache import delete_score
+from .exceptions import Conflict
+from .metrics import Gauge, timed
+from .pubsub import publish_roll
+from .score import MAX_FRAMES, MAX_PINS, MEMO_ENGINE, PrefixMemo, State, advance, changed, generate, next_roll, \
+    summarize, summary
+
+# Characters used to pack the rolls of a game in a string, a character per number of pins knocked
+ROLL_CHARS = '0123456789X'
+
+
+def pack_rolls(rolls):
+    """
+    Packs rolls in a string
+
+    :param rolls: List of rolls
+    :type rolls: list[int]
+
+    :rtype: str
+
+    :raises ValueError: If a roll is not 0-MAX_PINS
+    """
+    if any(roll < 0 or roll > MAX_PINS for roll in rolls):
+        raise ValueError("Invalid pins!")
+
+    return ''.join(ROLL_CHARS[roll] for roll in rolls)
+
+
+def unpack_rolls(packed):
+    """
+    Unpacks rolls packed with pack_rolls()
+
+    :param packed: Packed rolls
+    :type packed: str
+
+    :rtype: list[int]
+    """
+    return [ROLL_CHARS.index(char) for char in packed]
+
+
+# Memo of the 'memo' scoring engine in this process, see score_memo()
+_memo = None
+
+
+def score_memo():
+    """
+    Returns the prefix memo of this process with SCORE_MEMO_SIZE prefixes
+
+    :rtype: PrefixMemo
+    """
+    global _memo
+
+    if _memo is None or _memo.size != settings.SCORE_MEMO_SIZE:
+        _memo = PrefixMemo(settings.SCORE_MEMO_SIZE)
+
+    return _memo
+
+
+def _memo_stat(name):
+    """
+    Returns a function reading a statistic of the memo for the metrics
+    :rtype: callable
+    """
+    return lambda: _memo.stats()[name] if _memo is not None else 0
+
+
+Gauge('bowling_score_memo_hit_rate', "Share of the scored games resuming from a known prefix", _memo_stat('hit_rate'))
+Gauge('bowling_score_memo_resumed_rate', "Share of the rolls not scored again", _memo_stat('resumed_rate'))
+Gauge('bowling_score_memo_prefixes', "Roll prefixes kept by the memo", _memo_stat('prefixes'))
+Gauge('bowling_score_memo_bytes', "Approximate memory of the memo", _memo_stat('bytes'))
 
 
 class Game(models.Model):
+    # All the rolls of the game packed with pack_rolls()
+    packed_rolls = models.CharField(max_length=MAX_FRAMES * 2 + 1, default='', blank=True)
+
+    # Scoring state of the game after the last roll, see score.State
+    rolls_count = models.PositiveSmallIntegerField(default=0)
+    frame = models.PositiveSmallIntegerField(default=1)
+    frame_rolls = models.PositiveSmallIntegerField(default=0)
+    frame_pins = models.PositiveSmallIntegerField(default=0)
+    bonus_next = models.PositiveSmallIntegerField(default=0)
+    bonus_after = models.PositiveSmallIntegerField(default=0)
+    total = models.PositiveSmallIntegerField(default=0)
+
+    @property
+    def state(self):
+        """
+        Returns the scoring state of the game
+        :rtype: State
+        """
+        return State(*(getattr(self, field) for field in State._fields))
+
+    @state.setter
+    def state(self, state):
+        for field, value in zip(State._fields, state):
+            setattr(self, field, value)
+
+    @timed('Game.add_roll')
     def add_roll(self, roll):
         """
-        Adds a roll to a game
+        Adds a roll to a game.
+        The roll is validated and scored against the stored state so the previous rolls are not read.
 
         :param roll: Number of pins knocked
         :type roll: int
 
-        :return: List of Frames for the game
-        :rtype: list[Frame]
+        :return: Scoring state of the game after the roll
+        :rtype: State
         """
-        score = self.score(roll)
-        self.rolls.create(roll=roll)
+        try:
+            state = advance(self.state, roll)
+        except Exception as e:
+            raise ValidationError({'roll': str(e)})
 
-        return score
+        self._save_rolls([roll], state)
+
+        return state
+
+    def add_rolls(self, rolls):
+        """
+        Adds many rolls to a game at once.
+        All the rolls are validated before any of them is saved and they are saved in a single transaction.
+
+        :param rolls: Number of pins knocked for each roll
+        :type rolls: list[int]
+
+        :return: Scoring state of the game after the rolls
+        :rtype: State
+        """
+        state = self.state
+
+        for index, roll in enumerate(rolls):
+            try:
+                state = advance(state, roll)
+            except Exception as e:
+                raise ValidationError({'rolls': {index: str(e)}})
+
+        self._save_rolls(rolls, state)
+
+        return state
+
+    def _save_rolls(self, rolls, state):
+        """
+        Saves already validated rolls in the game and a Roll for each of them if ROLL_AUDIT is enabled.
+        The rolls count is used as a version of the game so the rolls are saved only if no other
+        request added rolls after the game was read.
+
+        :param rolls: Number of pins knocked for each roll
+        :type rolls: list[int]
+
+        :param state: Scoring state of the game after the rolls
+        :type state: State
+
+        :raises Conflict: If the game was changed by another request
+        """
+        packed_rolls = self.packed_rolls + pack_rolls(rolls)
 
+        if settings.ROLL_AUDIT:
+            with transaction.atomic():
+                self._update_rolls(packed_rolls, state)
+
+                try:
+                    Roll.objects.bulk_create([
+                        Roll(game=self, seq=self.rolls_count + index, roll=roll) for index, roll in enumerate(rolls)
+                    ])
+                except IntegrityError:
+                    raise Conflict({'game': "The game was changed by another roll, please retry!"})
+        else:
+            # A single UPDATE is atomic by itself
+            self._update_rolls(packed_rolls, state)
+
+        delete_score(self.pk, self.rolls_count)
+        rolls_count = state.rolls_count
+        transaction.on_commit(lambda: publish_roll(self.pk, rolls_count))
+
+        self.packed_rolls = packed_rolls
+        self.state = state
+
+    def _update_rolls(self, packed_rolls, state):
+        """
+        Saves the rolls and the state of the game with a single UPDATE
+        if the game still has the rolls count it was read with.
+
+        :param packed_rolls: All the rolls of the game packed with pack_rolls()
+        :type packed_rolls: str
+
+        :param state: Scoring state of the game after the rolls
+        :type state: State
+
+        :raises Conflict: If the game was changed by another request
+        """
+        updated = Game.objects.filter(pk=self.pk, rolls_count=self.rolls_count).update(
+            packed_rolls=packed_rolls,
+            **state._asdict()
+        )
+
+        if not updated:
+            raise Conflict({'game': "The game was changed by another roll, please retry!"})
+
+    @timed('Game.score', scoring=True)
     def score(self, include=None):
         """
         Generates all the frames for the game
@@ -31,28 +214,109 @@ class Game(models.Model):
         :return: List of Frames for the game
         :rtype: list[Frame]
         """
-        rolls = list(self.rolls.values_list('roll', flat=True))
+        rolls = unpack_rolls(self.packed_rolls)
 
         if include:
             rolls.append(include)
 
+        return self.score_rolls(rolls)
+
+    def score_since(self, since):
+        """
+        Generates the frames of the game which are new or changed since the game had fewer rolls
+
+        :param since: Number of rolls the game had
+        :type since: int
+
+        :return: List of Frames which are changed
+        :rtype: list[Frame]
+        """
+        rolls = unpack_rolls(self.packed_rolls)
+
+        return changed(self.score_rolls(rolls), self.score_rolls(rolls[:since]))
+
+    @staticmethod
+    def score_rolls(rolls):
+        """
+        Generates all the frames for the given rolls of a game
+
+        :param rolls: List of rolls
+        :type rolls: list[int]
+
+        :return: List of Frames for the game
+        :rtype: list[Frame]
+        """
+        memo = score_memo() if settings.SCORE_ENGINE == MEMO_ENGINE else None
+
         try:
-            score = generate(rolls)
+            score = generate(rolls, settings.SCORE_ENGINE, memo)
         except Exception as e:
             raise ValidationError({'roll': str(e)})
 
         return score
 
+    def summary(self):
+        """
+        Returns the running score of the game from its stored state without scoring the rolls
+
+        :rtype: Summary
+        """
+        return summary(self.state)
+
+    def next_roll(self):
+        """
+        Returns the legal next roll of the game from its stored state without scoring the rolls
+
+        :rtype: NextRoll
+        """
+        return next_roll(self.state)
+
+    @staticmethod
+    def summarize_rolls(rolls):
+        """
+        Returns the running score for the given rolls of a game without generating the frames
+
+        :param rolls: List of rolls
+        :type rolls: list[int]
+
+        :rtype: Summary
+        """
+        try:
+            return summarize(rolls)
+        except Exception as e:
+            raise ValidationError({'roll': str(e)})
+
+    @classmethod
+    def rolls_many(cls, pks):
+        """
+        Returns the rolls of many games with a single query
+
+        :param pks: Game ids
+        :type pks: list[int]
+
+        :return: List of rolls for each existing game
+        :rtype: dict[int, list[int]]
+        """
+        return {
+            pk: unpack_rolls(packed)
+            for pk, packed in cls.objects.filter(pk__in=pks).values_list('pk', 'packed_rolls')
+        }
+
     def __str__(self):
         return 'Game ' + str(self.pk)
 
 
 class Roll(models.Model):
     game = models.ForeignKey(Game, related_name='rolls')
+    seq = models.PositiveSmallIntegerField()  # Position of the roll in the game starting from 0
     roll = models.IntegerField(validators=[
         MinValueValidator(0),
         MaxValueValidator(MAX_PINS)
     ])
 
+    class Meta:
+        # A roll can be saved only once at each position and the rolls of a game are read in order by the index
+        unique_together = (('game', 'seq'),)
+
     def __str__(self):
-        return 'Game ' + str(self.game.pk) + ' roll ' + str(self.roll)
+        return 'Game ' + str(self.game.pk) + ' roll ' + str(self.seq) + ' ' + str(self.roll)
@@ -0,0 +1,179 @@
+import asyncio
+import collections
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Backend instances by the SCORE_PUBSUB path
+_backends = {}
+
+
+class Subscription(object):
+    """
+    Messages published for a game and not yet received by one subscriber.
+    The buffer keeps at most size messages, the oldest ones are dropped when a subscriber is too slow.
+    """
+    def __init__(self, game, size):
+        self.game = game
+        self.messages = collections.deque(maxlen=size)
+        self.dropped = 0
+        self._condition = threading.Condition()
+        self._wakeups = []
+
+    def put(self, message):
+        """
+        Adds a message to the buffer and wakes up the waiting subscriber
+
+        :param message: Published message
+        :type message: object
+        """
+        with self._condition:
+            if len(self.messages) == self.messages.maxlen:
+                self.dropped += 1
+
+            self.messages.append(message)
+            self._condition.notify_all()
+            wakeups = list(self._wakeups)
+
+        for wakeup in wakeups:
+            wakeup()
+
+    def _pop(self):
+        """
+        Removes and returns the oldest message or None
+        :rtype: object|None
+        """
+        with self._condition:
+            return self.messages.popleft() if self.messages else None
+
+    def get(self, timeout=None):
+        """
+        Waits for a message in the current thread
+
+        :param timeout: Seconds to wait
+        :type timeout: float
+
+        :return: The oldest message or None on timeout
+        :rtype: object|None
+        """
+        with self._condition:
+            if not self.messages:
+                self._condition.wait(timeout)
+
+        return self._pop()
+
+    async def aget(self, timeout=None):
+        """
+        Waits for a message in the event loop without holding a thread
+
+        :param timeout: Seconds to wait
+        :type timeout: float
+
+        :return: The oldest message or None on timeout
+        :rtype: object|None
+        """
+        loop = asyncio.get_event_loop()
+        event = asyncio.Event()
+
+        def wakeup():
+            loop.call_soon_threadsafe(event.set)
+
+        with self._condition:
+            if self.messages:
+                return self.messages.popleft()
+
+            self._wakeups.append(wakeup)
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._wakeups.remove(wakeup)
+
+        return self._pop()
+
+
+class LocalPubSub(object):
+    """
+    Publishes the messages to the subscribers in this process.
+    The rolls and the streams must be served by the same process, eg. a single ASGI worker.
+    Backends delivering across processes implement the same subscribe(), unsubscribe() and publish().
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, game):
+        """
+        Subscribes to the messages of a game
+
+        :param game: Game id
+        :type game: int
+
+        :rtype: Subscription
+        """
+        subscription = Subscription(game, settings.STREAM_BUFFER)
+
+        with self._lock:
+            self._subscriptions.setdefault(game, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stops the messages to a subscription
+
+        :param subscription: Subscription returned by subscribe()
+        :type subscription: Subscription
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.game, set())
+            subscriptions.discard(subscription)
+
+            if not subscriptions:
+                self._subscriptions.pop(subscription.game, None)
+
+    def publish(self, game, message):
+        """
+        Sends a message to all the subscribers of a game
+
+        :param game: Game id
+        :type game: int
+
+        :param message: Message to send
+        :type message: object
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(game, ()))
+
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+def get_pubsub():
+    """
+    Returns the pub/sub backend configured with SCORE_PUBSUB
+    :rtype: LocalPubSub
+    """
+    path = settings.SCORE_PUBSUB
+
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+
+    return _backends[path]
+
+
+def publish_roll(game, rolls_count):
+    """
+    Tells the streams of a game that it has new rolls
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+    """
+    get_pubsub().publish(game, rolls_count)
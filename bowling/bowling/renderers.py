@@ -0,0 +1,53 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renderer which serializes to JSON with orjson when it's installed.
+    It's meant for data made only of dicts, lists, numbers, strings and booleans
+    like the one from score_data() because orjson does not know the DRF encoder types.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(data)
+
+
+def event(name, data, id=None):
+    """
+    Renders a Server-Sent Event
+
+    :param name: Event name
+    :type name: str
+
+    :param data: Event data rendered as JSON
+    :type data: dict
+
+    :param id: Event id, the client sends back the last one as Last-Event-ID when it reconnects
+    :type id: int|None
+
+    :rtype: bytes
+    """
+    content = b'event: %s\ndata: %s\n\n' % (name.encode('ascii'), FastJSONRenderer().render(data))
+
+    return content if id is None else b'id: %d\n' % id + content
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renderer for the Server-Sent Events streams.
+    The events are rendered by the stream itself, only the errors before the stream starts
+    are rendered here as an error event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return event('error', data)
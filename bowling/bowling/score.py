@@ -1,37 +1,76 @@
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+from .metrics import timed
+
 MAX_PINS = 10
 MAX_FRAMES = 10
 
+# Scoring engines which generate() can use
+FRAME_ENGINE = 'frame'  # Frame objects adding the rolls one by one
+TABLE_ENGINE = 'table'  # Precomputed transition table, see generate_table()
+MEMO_ENGINE = 'memo'  # Transition table resuming from the scored prefixes, see PrefixMemo
+
+# Default number of prefixes kept by the memo of MEMO_ENGINE
+MEMO_SIZE = 10000
+
 
-def generate(rolls):
+@timed('generate', scoring=True)
+def generate(rolls, engine=FRAME_ENGINE, memo=None):
     """
     Generates a list of frames for a given rolls
 
     :param rolls: List of rolls
     :type rolls: list[int]
 
+    :param engine: Scoring engine FRAME_ENGINE, TABLE_ENGINE or MEMO_ENGINE
+    :type engine: str
+
+    :param memo: Memo used by MEMO_ENGINE, a memo of MEMO_SIZE prefixes shared by the process if it's not given
+    :type memo: PrefixMemo|None
+
     :rtype: list[Frame]
     """
-    frames = []
+    if engine == TABLE_ENGINE:
+        return generate_table(rolls)
+    elif engine == MEMO_ENGINE:
+        return (memo or default_memo()).generate(rolls)
+    elif engine != FRAME_ENGINE:
+        raise ValueError("Unknown score engine %s!" % engine)
+
+    return list(iter_frames(rolls))
+
+
+def iter_frames(rolls):
+    """
+    Generates the frames for a given rolls one by one, the same frames as generate() with the FRAME_ENGINE.
+    A frame is yielded as soon as its rolls are completed so a caller stopping early does not score the rest.
+    The exceptions of an invalid roll are raised when the frames are read up to it.
+
+    :param rolls: List of rolls
+    :type rolls: list[int]
+
+    :rtype: collections.Iterator[Frame]
+    """
     rolls_count = len(rolls)
     frame = Frame(1)
 
     for index, roll in enumerate(rolls):
         if frame.end_frame and frame.completed:
-            # If the last frame is completed in strike or spare
-            # we've read this rolls ahead of time so we want to skip them because they will add new frames
-            # But we still need to throw an Exception if there are more rolls added by the user
-            rolls_diff = rolls_count - index
-
-            if (frame.strike and rolls_diff > 2) or \
-                    (frame.spare and rolls_diff > 1) or \
-                    (not frame.strike and not frame.spare and rolls_diff > 0):
-                raise Exception("You cannot have more than a %d frames in a game!" % MAX_FRAMES)
-
-            continue
+            # The last frame takes its bonus rolls itself so anything after it is an extra frame
+            raise Exception("You cannot have more than a %d frames in a game!" % MAX_FRAMES)
 
         frame = Frame(frame.number + 1, frame.score) if frame.rolls_completed else frame
         frame.add_roll(roll)
 
+        if frame.end_frame:
+            # The last frame does not read ahead, its bonus rolls are added one by one
+            if frame.rolls_completed or index == rolls_count - 1:
+                yield frame
+
+            continue
+
         try:
             if frame.spare:
                 frame.add_roll(rolls[index + 1])
@@ -44,15 +83,612 @@ def generate(rolls):
             pass
 
         if frame.rolls_completed or index == rolls_count - 1:
-            # Append the frame in result if the rolls for the frame are completed
+            # Yield the frame if the rolls for the frame are completed
             # or it's a last frame for the given rolls
-            frames.append(frame)
+            yield frame
+
+
+def changed(frames, since_frames):
+    """
+    Returns the frames which are new or changed compared to the frames generated for fewer rolls of the game
+
+    :param frames: Frames for all the rolls
+    :type frames: list[Frame]
+
+    :param since_frames: Frames for the first rolls
+    :type since_frames: list[Frame]
+
+    :rtype: list[Frame]
+    """
+    since = {frame.number: (frame.rolls, frame.score, frame.completed) for frame in since_frames}
+
+    return [frame for frame in frames if since.get(frame.number) != (frame.rolls, frame.score, frame.completed)]
+
+
+# Scores of many games generated by generate_many(), arrays have a row per game
+#  frames - Number of frames in the game as generate() returns them
+#  score - Score of each frame, 0 for the frames which are not played yet
+#  strike - Is there a strike in each frame
+#  spare - Is there a spare in each frame
+#  completed - Is each frame completed
+#  valid - False for the games for which generate() raises an exception, all the other arrays are zeros for them
+Batch = namedtuple('Batch', ('frames', 'score', 'strike', 'spare', 'completed', 'valid'))
+
+# Value used to pad the rolls of the shorter games for generate_many()
+PAD = -1
+
+
+def generate_many(rolls):
+    """
+    Generates the frames of many games at once.
+    Scoring is vectorized over the games so a batch is scored with a few numpy operations per roll.
+    Requires numpy.
+
+    :param rolls: 2-D array with the rolls of a game per row, padded with PAD (any negative value) at the end
+    :type rolls: numpy.ndarray
+
+    :rtype: Batch
+    """
+    import numpy
+
+    rolls = numpy.asarray(rolls)
+    games = len(rolls)
+    # Clip before the int16 cast so out of range rolls stay invalid and negative ones stay padding
+    rolls = numpy.clip(rolls.reshape(games, -1) if games else rolls.reshape(0, 0), PAD, MAX_PINS + 1)
+    rolls = rolls.astype(numpy.int16)
+    rows = numpy.arange(games)
+
+    valid = numpy.ones(games, dtype=bool)
+    ended = numpy.zeros(games, dtype=bool)  # Padding is reached
+    frame = numpy.zeros(games, dtype=numpy.intp)  # Current frame index 0-(MAX_FRAMES - 1)
+    frame_rolls = numpy.zeros(games, dtype=numpy.int16)
+    frame_pins = numpy.zeros(games, dtype=numpy.int16)
+
+    points = numpy.zeros((games, MAX_FRAMES), dtype=numpy.int16)  # Pins and bonuses of each frame
+    bonus_left = numpy.zeros((games, MAX_FRAMES), dtype=numpy.int16)  # Rolls to be added as bonus to each frame
+    played = numpy.zeros((games, MAX_FRAMES), dtype=bool)  # Frame has at least one roll
+    rolls_completed = numpy.zeros((games, MAX_FRAMES), dtype=bool)
+    strike = numpy.zeros((games, MAX_FRAMES), dtype=bool)
+    spare = numpy.zeros((games, MAX_FRAMES), dtype=bool)
+
+    for column in rolls.T:
+        ended |= column < 0
+        active = valid & ~ended
+
+        # Same checks as advance() in the same order
+        end_frame = frame == MAX_FRAMES - 1
+        over = end_frame & ((frame_rolls == 3) | ((frame_rolls == 2) & (frame_pins < MAX_PINS)))
+        invalid = active & (over | (column > MAX_PINS) | (column > MAX_PINS - frame_pins % MAX_PINS))
+        valid &= ~invalid
+        active &= ~invalid
+
+        roll = numpy.where(active, column, 0)
+        owed = (bonus_left > 0) & active[:, None]
+        points += owed * roll[:, None]
+        bonus_left -= owed
+
+        points[rows, frame] += roll
+        played[rows, frame] |= active
+        frame_rolls += active
+        frame_pins += roll
+
+        strike[rows, frame] |= active & (frame_rolls == 1) & (frame_pins == MAX_PINS)
+        spare[rows, frame] |= active & (frame_rolls == 2) & (frame_pins == MAX_PINS)
+
+        bonus = active & ~end_frame & (frame_pins == MAX_PINS)
+        bonus_left[rows[bonus], frame[bonus]] = numpy.where(frame_rolls[bonus] == 1, 2, 1)
+
+        closed = active & ~end_frame & ((frame_pins == MAX_PINS) | (frame_rolls == 2))
+        rolls_completed[rows[closed], frame[closed]] = True
+        frame += closed
+        frame_rolls[closed] = 0
+        frame_pins[closed] = 0
+
+    end_frame = frame == MAX_FRAMES - 1
+    rolls_completed[:, -1] = end_frame & ((frame_rolls == 3) | ((frame_rolls == 2) & (frame_pins < MAX_PINS)))
+
+    played &= valid[:, None]
+    score = numpy.where(played, numpy.cumsum(points, axis=1), 0)
+
+    return Batch(
+        frames=played.sum(axis=1),
+        score=score,
+        strike=strike & played,
+        spare=spare & played,
+        completed=rolls_completed & (bonus_left == 0) & played,
+        valid=valid
+    )
+
+
+# Compact scoring state of a game which is enough to validate and score the next roll
+#  rolls_count - Number of rolls in the game
+#  frame - Current frame number 1-MAX_FRAMES
+#  frame_rolls - Number of rolls in the current frame
+#  frame_pins - Sum of the rolls in the current frame
+#  bonus_next - How many times the next roll is added as a strike/spare bonus
+#  bonus_after - How many times the roll after the next one is added as a strike bonus
+#  total - Running score of the game
+State = namedtuple('State', (
+    'rolls_count', 'frame', 'frame_rolls', 'frame_pins', 'bonus_next', 'bonus_after', 'total'
+))
+
+INITIAL_STATE = State(rolls_count=0, frame=1, frame_rolls=0, frame_pins=0, bonus_next=0, bonus_after=0, total=0)
+
+
+def finished(state):
+    """
+    Is the game with the given state over
+
+    :param state: Scoring state of the game
+    :type state: State
+
+    :rtype: bool
+    """
+    if state.frame < MAX_FRAMES:
+        return False
+
+    # The last frame has a third roll only after a strike or a spare
+    return state.frame_rolls == 3 or (state.frame_rolls == 2 and state.frame_pins < MAX_PINS)
+
+
+def pins_left(state):
+    """
+    Returns the number of pins standing for the next roll
+
+    :param state: Scoring state of the game
+    :type state: State
+
+    :rtype: int
+    """
+    # In the last frame the pins are reset after each strike or spare
+    return MAX_PINS - state.frame_pins % MAX_PINS
+
+
+# Legal next roll of a game, see next_roll()
+#  min_pins, max_pins - Range of the pins the next roll can knock, None when the game is finished
+#  finished - Is the game over
+NextRoll = namedtuple('NextRoll', ('min_pins', 'max_pins', 'finished'))
+
+
+def next_roll(state):
+    """
+    Returns the range of the legal next roll from the scoring state without the rolls.
+    A roll in the range is accepted by advance() and any other one, negative or above the pins left,
+    raises an exception.
+
+    :param state: Scoring state of the game
+    :type state: State
+
+    :rtype: NextRoll
+    """
+    if finished(state):
+        return NextRoll(min_pins=None, max_pins=None, finished=True)
+
+    return NextRoll(min_pins=0, max_pins=pins_left(state), finished=False)
+
+
+def advance(state, roll):
+    """
+    Scores a single roll on top of the given state without the previous rolls.
+    Raises the same exceptions as generate() for the same rolls.
+
+    :param state: Scoring state of the game before the roll
+    :type state: State
+
+    :param roll: Number of pins knocked
+    :type roll: int
+
+    :return: Scoring state of the game after the roll
+    :rtype: State
+    """
+    if finished(state):
+        raise Exception("You cannot have more than a %d frames in a game!" % MAX_FRAMES)
+
+    if roll < 0 or roll > MAX_PINS:
+        raise Exception("Invalid pins!")
+
+    if roll > pins_left(state):
+        raise Exception('Exceeded maximum pins for a frame!')
+
+    frame = state.frame
+    frame_rolls = state.frame_rolls + 1
+    frame_pins = state.frame_pins + roll
+    bonus_next = state.bonus_after
+    bonus_after = 0
+
+    if frame < MAX_FRAMES:
+        if frame_pins == MAX_PINS:
+            # Strike or spare, the next roll is added to this frame too and after a strike the one after it
+            bonus_next += 1
+            bonus_after += 1 if frame_rolls == 1 else 0
+
+        if frame_pins == MAX_PINS or frame_rolls == 2:
+            frame, frame_rolls, frame_pins = frame + 1, 0, 0
+
+    return State(
+        rolls_count=state.rolls_count + 1,
+        frame=frame,
+        frame_rolls=frame_rolls,
+        frame_pins=frame_pins,
+        bonus_next=bonus_next,
+        bonus_after=bonus_after,
+        total=state.total + roll * (1 + state.bonus_next)
+    )
+
+
+# Transition table used by generate_table(), it's built on first use
+_table = None
+
+
+def _build_table():
+    """
+    Builds the transition table of the reachable scoring states with advance().
+
+    Each state is a row (entries, pending, rolls_completed) where the entries are indexed by the roll
+    and the last entry is for an invalid roll. Each entry is (row, to_prev2, to_prev1, opens, error):
+     row - The row of the state after the roll
+     to_prev2, to_prev1 - 1 if the roll is added as a bonus to the frame 2 or 1 before the current one
+     opens - The roll is the first one in a new frame
+     error - Exception message if the roll is not allowed
+    pending is the number of trailing frames which are not completed
+    and rolls_completed is whether the last frame cannot accept more rolls.
+
+    :return: The row of the initial state
+    :rtype: tuple
+    """
+    def key(state):
+        # The rolls count and the total are not needed to score the next roll
+        return state._replace(rolls_count=0, total=0)
+
+    rows = {}
+    queue = [key(INITIAL_STATE)]
+
+    while queue:
+        state = queue.pop()
+
+        if state in rows:
             continue
 
+        entries = []
+
+        for roll in range(MAX_PINS + 2):
+            try:
+                next_state = key(advance(state, roll))
+            except Exception as e:
+                entries.append((None, 0, 0, False, str(e)))
+                continue
+
+            queue.append(next_state)
+            entries.append((
+                next_state,
+                1 if state.bonus_next == 2 else 0,
+                1 if state.bonus_next >= 1 else 0,
+                state.frame_rolls == 0,
+                None
+            ))
+
+        in_frame = state.frame_rolls > 0 and not finished(state)
+        rows[state] = (entries, state.bonus_next + (1 if in_frame else 0), not in_frame)
+
+    # Link the entries to the rows directly so the lookup is a single list index
+    for entries, pending, rolls_completed in rows.values():
+        for index, (next_state, to_prev2, to_prev1, opens, error) in enumerate(entries):
+            entries[index] = (rows.get(next_state), to_prev2, to_prev1, opens, error)
+
+    return rows[key(INITIAL_STATE)]
+
+
+def _table_row():
+    """
+    Returns the row of the initial state of the transition table, the table is built on first use
+    :rtype: tuple
+    """
+    global _table
+
+    if _table is None:
+        _table = _build_table()
+
+    return _table
+
+
+def _table_roll(row, roll, index, starts, points):
+    """
+    Scores a single roll with the transition table
+
+    :param row: Row of the state before the roll
+    :type row: tuple
+
+    :param roll: Number of pins knocked
+    :type roll: int
+
+    :param index: Index of the roll in the game
+    :type index: int
+
+    :param starts: Index of the first roll of each frame, a frame is added if the roll opens one
+    :type starts: list[int]
+
+    :param points: Points of each frame after two placeholders for the bonuses of the first frames, updated in place
+    :type points: list[int]
+
+    :return: Row of the state after the roll
+    :rtype: tuple
+    """
+    row, to_prev2, to_prev1, opens, error = row[0][roll if 0 <= roll <= MAX_PINS else MAX_PINS + 1]
+
+    if error:
+        raise Exception(error)
+
+    if opens:
+        starts.append(index)
+        points.append(0)
+
+    points[-1] += roll
+    points[-2] += roll * to_prev1
+    points[-3] += roll * to_prev2
+
+    return row
+
+
+def _table_frames(rolls, row, starts, points):
+    """
+    Creates the frames of the rolls scored with _table_roll()
+
+    :rtype: list[Frame]
+    """
+    entries, pending, rolls_completed = row
+    count = len(starts)
+    completed = count - pending
+    frames = []
+    score = 0
+
+    for index, start in enumerate(starts):
+        score += points[index + 2]
+        frames.append(Frame.restore(
+            index + 1,
+            rolls[start:starts[index + 1] if index + 1 < count else None],
+            score,
+            index < completed,
+            index < count - 1 or rolls_completed
+        ))
+
     return frames
 
 
+def generate_table(rolls):
+    """
+    Generates a list of frames for a given rolls with a precomputed transition table.
+    The frames and the exceptions are the same as generate() with the FRAME_ENGINE.
+
+    :param rolls: List of rolls
+    :type rolls: list[int]
+
+    :rtype: list[Frame]
+    """
+    row = _table_row()
+    starts = []
+    points = [0, 0]  # Points of each frame, the first two are placeholders for the bonuses of the first frames
+
+    for index, roll in enumerate(rolls):
+        row = _table_roll(row, roll, index, starts, points)
+
+    return _table_frames(rolls, row, starts, points)
+
+
+# Running score of a game without its frames, see summarize()
+#  total - Score of the game so far
+#  frame - Number of the frame the next roll goes to, MAX_FRAMES when the game is finished
+#  finished - Is the game over
+#  rolls_count - Number of rolls in the game
+Summary = namedtuple('Summary', ('total', 'frame', 'finished', 'rolls_count'))
+
+
+def summary(state):
+    """
+    Returns the summary of a game from its scoring state without the rolls
+
+    :param state: Scoring state of the game
+    :type state: State
+
+    :rtype: Summary
+    """
+    return Summary(total=state.total, frame=state.frame, finished=finished(state), rolls_count=state.rolls_count)
+
+
+def summarize(rolls):
+    """
+    Returns the total, the current frame and the completion of a game without creating Frame objects.
+    The rolls are folded with the transition table of generate_table() so the exceptions are the same as generate().
+
+    :param rolls: List of rolls
+    :type rolls: list[int]
+
+    :rtype: Summary
+    """
+    row = _table_row()
+    total = 0
+    frames = 0
+
+    for roll in rolls:
+        row, to_prev2, to_prev1, opens, error = row[0][roll if 0 <= roll <= MAX_PINS else MAX_PINS + 1]
+
+        if error:
+            raise Exception(error)
+
+        frames += opens
+        total += roll * (1 + to_prev1 + to_prev2)
+
+    # A row without an open frame is either between two frames or after the last one
+    over = row[2] and frames == MAX_FRAMES
+
+    return Summary(total=total, frame=frames if over or not row[2] else frames + 1, finished=over, rolls_count=len(rolls))
+
+
+class _PrefixNode(object):
+    """
+    Scoring state of the transition table after a prefix of rolls
+    """
+    __slots__ = ('parent', 'roll', 'children', 'row', 'starts', 'points', 'size')
+
+    def __init__(self, parent, roll, row, starts, points):
+        self.parent = parent
+        self.roll = roll
+        self.children = {}
+        self.row = row
+        self.starts = starts
+        self.points = points
+        self.size = 0
+
+
+class PrefixMemo(object):
+    """
+    Trie of the scored roll prefixes with the transition table state after each of them.
+    Scoring resumes from the deepest known prefix of the rolls instead of the first roll.
+    At most size prefixes are kept, the least recently used ones are evicted.
+    A lookup touches its path from the longest prefix to the shortest one, so a prefix is always more recent
+    than its longer ones. The evicted prefix is therefore a leaf and the short prefixes shared by many games
+    are evicted last.
+    """
+    def __init__(self, size=MEMO_SIZE):
+        self.size = size
+        self._root = None
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.lookups = 0
+        self.hits = 0
+        self.rolls = 0
+        self.resumed_rolls = 0
+        self.evictions = 0
+
+    def generate(self, rolls):
+        """
+        Generates a list of frames for a given rolls like generate_table()
+
+        :param rolls: List of rolls
+        :type rolls: list[int]
+
+        :rtype: list[Frame]
+        """
+        with self._lock:
+            if self._root is None:
+                self._root = _PrefixNode(None, None, _table_row(), (), (0, 0))
+
+            node = self._root
+            path = []
+
+            while len(path) < len(rolls):
+                child = node.children.get(rolls[len(path)])
+
+                if child is None:
+                    break
+
+                node = child
+                path.append(node)
+
+            depth = len(path)
+            self.lookups += 1
+            self.hits += 1 if depth else 0
+            self.rolls += len(rolls)
+            self.resumed_rolls += depth
+
+            row, starts, points = node.row, list(node.starts), list(node.points)
+
+            for index in range(depth, len(rolls)):
+                row = _table_roll(row, rolls[index], index, starts, points)
+
+                if self.size > 0:
+                    node = self._insert(node, rolls[index], row, starts, points)
+                    path.append(node)
+
+            # From the longest prefix so each prefix is more recent than its longer ones
+            for node in reversed(path):
+                self._lru.move_to_end(node)
+
+            while len(self._lru) > self.size:
+                self._evict()
+
+        return _table_frames(rolls, row, starts, points)
+
+    def _insert(self, parent, roll, row, starts, points):
+        """
+        Adds the state after a prefix as a child of the state of the prefix without its last roll
+
+        :return: The new node
+        :rtype: _PrefixNode
+        """
+        node = _PrefixNode(parent, roll, row, tuple(starts), tuple(points))
+        node.size = self._node_bytes(node)
+        parent.children[roll] = node
+        self._lru[node] = None
+        self._bytes += node.size
+
+        return node
+
+    def _evict(self):
+        """
+        Removes the least recently used prefix, it has no longer prefixes because they are less recent
+        """
+        node, _ = self._lru.popitem(last=False)
+        del node.parent.children[node.roll]
+        # The size counted by _insert(), the children dict may have grown since
+        self._bytes -= node.size
+        self.evictions += 1
+
+    @staticmethod
+    def _node_bytes(node):
+        """
+        Approximate memory used by a node
+        :rtype: int
+        """
+        return sys.getsizeof(node) + sys.getsizeof(node.children) + sys.getsizeof(node.starts) + \
+            sys.getsizeof(node.points)
+
+    def stats(self):
+        """
+        Returns the number of lookups, the hit rate (lookups resuming from a known prefix),
+        the share of the rolls which were not scored again, the kept prefixes and their approximate memory
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'hit_rate': float(self.hits) / self.lookups if self.lookups else 0.0,
+                'resumed_rate': float(self.resumed_rolls) / self.rolls if self.rolls else 0.0,
+                'prefixes': len(self._lru),
+                'size': self.size,
+                'evictions': self.evictions,
+                'bytes': self._bytes,
+            }
+
+
+# Memo used by MEMO_ENGINE when no other is given
+_default_memo = None
+
+
+def default_memo():
+    """
+    Returns the memo of MEMO_SIZE prefixes shared by this process
+    :rtype: PrefixMemo
+    """
+    global _default_memo
+
+    if _default_memo is None:
+        _default_memo = PrefixMemo(MEMO_SIZE)
+
+    return _default_memo
+
+
 class Frame(object):
+    # Frames are created for every roll request so they don't get a __dict__
+    __slots__ = (
+        '_number', '_end_frame',
+        '_rolls', '_rolls_sum', '_rolls_count',
+        '_next_rolls_sum', '_next_rolls_count',
+        '_strike', '_spare',
+        '_prev_score', '_score', '_completed', '_rolls_completed'
+    )
+
     def __init__(self, number, prev_score=0):
         """
         :param number: The frame number in the game 1-MAX_FRAMES
@@ -71,8 +707,7 @@ class Frame(object):
         self._rolls_sum = 0
         self._rolls_count = 0
 
-        self._next_rolls = []  # List of rolls that summed in this frame but they are from next frames
-        self._next_rolls_sum = 0
+        self._next_rolls_sum = 0  # Sum of rolls that summed in this frame but they are from next frames
         self._next_rolls_count = 0
 
         self._strike = False  # Does it have strike in this frame
@@ -83,6 +718,40 @@ class Frame(object):
         self._completed = False  # Frame is completed when no information is required for next rolls
         self._rolls_completed = False
 
+    @classmethod
+    def restore(cls, number, rolls, score, completed, rolls_completed):
+        """
+        Creates a frame from already calculated values without adding the rolls one by one
+
+        :param number: The frame number in the game 1-MAX_FRAMES
+        :type number: int
+
+        :param rolls: The rolls in the frame
+        :type rolls: list[int]
+
+        :param score: Score of the frame
+        :type score: int
+
+        :param completed: Frame does not need any additional rolls to compute a final score
+        :type completed: bool
+
+        :param rolls_completed: Frame cannot accept more rolls
+        :type rolls_completed: bool
+
+        :rtype: Frame
+        """
+        frame = cls(number)
+        frame._rolls = rolls
+        frame._rolls_sum = sum(rolls)
+        frame._rolls_count = len(rolls)
+        frame._strike = frame._rolls_count >= 1 and rolls[0] == MAX_PINS
+        frame._spare = frame._rolls_count >= 2 and rolls[0] + rolls[1] == MAX_PINS
+        frame._score = score
+        frame._completed = completed
+        frame._rolls_completed = rolls_completed
+
+        return frame
+
     @property
     def number(self):
         """
@@ -160,22 +829,21 @@ class Frame(object):
         if self.completed:
             raise Exception('You cannot add a roll to a completed frame!')
 
-        if roll > MAX_PINS:
+        if roll < 0 or roll > MAX_PINS:
             raise Exception("Invalid pins!")
 
         if not self.end_frame and (self.strike or self.spare):
             # If the roll belongs to next frame
-            self._next_rolls.append(roll)
-            self._next_rolls_sum = sum(self._next_rolls)
-            self._next_rolls_count = len(self._next_rolls)
+            self._next_rolls_sum += roll
+            self._next_rolls_count += 1
         else:
             # If the roll belongs to this frame
             if self._rolls_sum + roll > self._calculate_rolls_sum_max():
                 raise Exception('Exceeded maximum pins for a frame!')
 
             self._rolls.append(roll)
-            self._rolls_sum = sum(self._rolls)
-            self._rolls_count = len(self._rolls)
+            self._rolls_sum += roll
+            self._rolls_count += 1
 
         self._strike = self._rolls_count >= 1 and self._rolls[0] == MAX_PINS
         self._spare = self._rolls_count >= 2 and self._rolls[0] + self._rolls[1] == MAX_PINS
@@ -220,6 +888,10 @@ class Frame(object):
             # This handles the case where we have 2 strikes in last frame
             # and last max option is another strike
             return MAX_PINS * 3
+        elif self.end_frame and self.strike:
+            # This handles the case where we have a strike on first roll and the second one is not a strike
+            # so the third roll can only knock the pins left from the second one
+            return MAX_PINS * 2
         elif self.end_frame and self._rolls_sum == MAX_PINS:
             # This handles the case where we have a strike on first roll or spare in first 2 rolls
             # and last max option is another strike
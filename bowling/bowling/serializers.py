@@ -1,30 +1,60 @@
 from rest_framework import serializers
 from rest_framework.compat import MinValueValidator, MaxValueValidator
 
-from .models import Game
 from .score import MAX_PINS, MAX_FRAMES
 
 
-class ValidateGameMixin(object):
-    def validate_game(self, game):
-        if Game.objects.filter(pk=game).exists():
-            return game
-
-        raise serializers.ValidationError("Game does not exist!")
+# Views of the game information, the frames with their scores or only the running score
+FRAMES_VIEW = 'frames'
+SUMMARY_VIEW = 'summary'
 
 
-class GameRequestSerializer(ValidateGameMixin, serializers.Serializer):
+class GameRequestSerializer(serializers.Serializer):
     game = serializers.IntegerField()
+    since = serializers.IntegerField(required=False, min_value=0)
+    view = serializers.ChoiceField(choices=(FRAMES_VIEW, SUMMARY_VIEW), default=FRAMES_VIEW)
+
 
+class GamesRequestSerializer(serializers.Serializer):
+    # Maximum number of games that can be requested at once
+    MAX_GAMES = 100
+
+    game = serializers.CharField()
+    view = serializers.ChoiceField(choices=(FRAMES_VIEW, SUMMARY_VIEW), default=FRAMES_VIEW)
+
+    def validate_game(self, game):
+        try:
+            games = [int(pk) for pk in game.split(',') if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError("A comma separated list of games is expected!")
 
-class RollRequestSerializer(ValidateGameMixin, serializers.Serializer):
+        if len(games) > self.MAX_GAMES:
+            raise serializers.ValidationError("You cannot request more than %d games!" % self.MAX_GAMES)
+
+        return games
+
+
+class RollRequestSerializer(serializers.Serializer):
     game = serializers.IntegerField()
+    since = serializers.IntegerField(required=False, min_value=0)
     roll = serializers.IntegerField(validators=(
         MinValueValidator(0),
         MaxValueValidator(MAX_PINS)
     ))
 
 
+class RollsRequestSerializer(serializers.Serializer):
+    game = serializers.IntegerField()
+    rolls = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_rolls(self, rolls):
+        for index, roll in enumerate(rolls):
+            if roll < 0 or roll > MAX_PINS:
+                raise serializers.ValidationError({index: "Invalid pins!"})
+
+        return rolls
+
+
 class FrameSerializer(serializers.Serializer):
     rolls = serializers.ListField(child=serializers.IntegerField(), read_only=True)
     number = serializers.IntegerField(read_only=True, validators=[
@@ -37,6 +67,110 @@ class FrameSerializer(serializers.Serializer):
     completed = serializers.BooleanField(read_only=True)
 
 
+class NextRollRequestSerializer(serializers.Serializer):
+    game = serializers.IntegerField()
+
+
 class ScoreSerializer(serializers.Serializer):
     game = serializers.IntegerField(read_only=True)
     score = FrameSerializer(many=True, read_only=True)
+
+
+class SummarySerializer(serializers.Serializer):
+    game = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    frame = serializers.IntegerField(read_only=True)
+    finished = serializers.BooleanField(read_only=True)
+    rolls_count = serializers.IntegerField(read_only=True)
+
+
+def frame_data(frame):
+    """
+    Returns the same data as FrameSerializer without going through the serializer fields
+
+    :param frame: The frame
+    :type frame: Frame
+
+    :rtype: dict
+    """
+    return {
+        'rolls': list(frame.rolls),
+        'number': frame.number,
+        'strike': frame.strike,
+        'spare': frame.spare,
+        'score': frame.score,
+        'completed': frame.completed
+    }
+
+
+def score_data(game, frames):
+    """
+    Returns the same data as ScoreSerializer without going through the serializer fields
+
+    :param game: Game id
+    :type game: int
+
+    :param frames: Frames of the game
+    :type frames: list[Frame]
+
+    :rtype: dict
+    """
+    return {
+        'game': game,
+        'score': [frame_data(frame) for frame in frames]
+    }
+
+
+class NextRollSerializer(serializers.Serializer):
+    game = serializers.IntegerField(read_only=True)
+    frame = serializers.IntegerField(read_only=True)
+    rolls_count = serializers.IntegerField(read_only=True)
+    min_pins = serializers.IntegerField(read_only=True, allow_null=True)
+    max_pins = serializers.IntegerField(read_only=True, allow_null=True)
+    finished = serializers.BooleanField(read_only=True)
+
+
+def summary_data(game, summary):
+    """
+    Returns the same data as SummarySerializer without going through the serializer fields
+
+    :param game: Game id
+    :type game: int
+
+    :param summary: Summary of the game
+    :type summary: Summary
+
+    :rtype: dict
+    """
+    return {
+        'game': game,
+        'total': summary.total,
+        'frame': summary.frame,
+        'finished': summary.finished,
+        'rolls_count': summary.rolls_count
+    }
+
+
+def next_roll_data(game, state, roll):
+    """
+    Returns the same data as NextRollSerializer without going through the serializer fields
+
+    :param game: Game id
+    :type game: int
+
+    :param state: Scoring state of the game
+    :type state: State
+
+    :param roll: Legal next roll of the game
+    :type roll: NextRoll
+
+    :rtype: dict
+    """
+    return {
+        'game': game,
+        'frame': state.frame,
+        'rolls_count': state.rolls_count,
+        'min_pins': roll.min_pins,
+        'max_pins': roll.max_pins,
+        'finished': roll.finished
+    }
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'bowling.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +84,38 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/1.9/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache used for the rendered game scores and for how long they are kept, see bowling.cache
+SCORE_CACHE = 'default'
+SCORE_CACHE_TIMEOUT = 60 * 60
+
+# Directory where each worker process writes its metrics so GET /metrics renders all the workers,
+# see bowling.metrics.share(). Empty it when the deployment starts. None keeps the metrics per process.
+METRICS_DIR = os.environ.get('BOWLING_METRICS_DIR')
+
+# Pub/sub backend telling the score streams about new rolls, see bowling.pubsub
+SCORE_PUBSUB = 'bowling.pubsub.LocalPubSub'
+
+# Seconds between heartbeats of an idle score stream and messages buffered for a slow stream
+STREAM_HEARTBEAT = 15
+STREAM_BUFFER = 16
+
+# Seconds a score stream waits for a pub/sub message before it reads the game again, the delay of a roll
+# served by another process with LocalPubSub
+STREAM_POLL = 1
+
+# Serve the score streams with the Django view too, only for a single process server like runserver.
+# A gunicorn sync worker is held by each open stream, bowling.asgi serves the streams in its event loop.
+STREAM_WSGI = False
+
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
 
@@ -127,4 +160,16 @@ REST_FRAMEWORK = {
    'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
-}
\ No newline at end of file
+}
+
+# Scoring engine used for the games 'frame', 'table' or 'memo', see bowling.score.generate
+SCORE_ENGINE = 'frame'
+
+# Number of roll prefixes the 'memo' engine keeps in each worker process, see bowling.score.PrefixMemo
+SCORE_MEMO_SIZE = 10000
+
+# The rolls are stored packed in the games, enable to also save a Roll row for each roll
+ROLL_AUDIT = False
+
+# Maximum seconds importing the WSGI application may take in a new process, see manage.py importtime
+STARTUP_BUDGET = 1.0
@@ -0,0 +1,43 @@
+"""
+Django settings for the bowling API only.
+
+Loads only what the game and roll endpoints need: no admin, sessions, messages,
+static files, templates or authentication. Used by bowling.wsgi_api.
+"""
+
+from .settings import *
+
+INSTALLED_APPS = [
+    'rest_framework',
+
+    'bowling'
+]
+
+MIDDLEWARE_CLASSES = [
+    'bowling.middleware.MetricsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'bowling.urls_api'
+
+TEMPLATES = []
+
+WSGI_APPLICATION = 'bowling.wsgi_api.application'
+
+AUTH_PASSWORD_VALIDATORS = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.AllowAny',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'UNAUTHENTICATED_USER': None,
+}
@@ -0,0 +1,20 @@
+"""
+Django settings for the load tests.
+
+The API only settings with the file SQLite database given by BOWLING_LOADTEST_DATABASE
+so the load tests never touch the development database. Used by bowling.loadtest.
+"""
+
+import tempfile
+
+from .settings_api import *
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get(
+            'BOWLING_LOADTEST_DATABASE',
+            os.path.join(tempfile.gettempdir(), 'bowling_loadtest.sqlite3')
+        ),
+    }
+}
@@ -1,9 +1,16 @@
+import tempfile
+
 from .settings import *
 
 DEBUG = True
 TESTING = True
+STREAM_WSGI = True
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3'
+        'ENGINE': 'django.db.backends.sqlite3',
+        'TEST': {
+            # File backed so the tests can use the database from many threads
+            'NAME': os.path.join(tempfile.gettempdir(), 'bowling_test.sqlite3')
+        }
     }
 }
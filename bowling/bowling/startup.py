@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Runs in a new interpreter, imports the module and reports the import time, the peak resident memory
+# (ru_maxrss is in kilobytes on Linux and in bytes on macOS) and any opened database connection
+_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import %s
+seconds = time.perf_counter() - start
+from django.db import connections
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'seconds': seconds,
+    'rss_bytes': rss if sys.platform == 'darwin' else rss * 1024,
+    'connections': [alias for alias in connections if connections[alias].connection is not None]
+}))
+'''
+
+
+def measure(module='bowling.wsgi_api'):
+    """
+    Imports a module in a new Python process with -X importtime (Python 3.7+)
+    and returns how long the import took, the resident memory after it (what a preloaded gunicorn
+    master shares with its workers), the database connections opened on import and the -X importtime lines.
+
+    :param module: Module to import, usually a WSGI entry point
+    :type module: str
+
+    :rtype: dict
+    """
+    env = dict(os.environ)
+    # Let the entry point choose its own settings as it does under gunicorn
+    env.pop('DJANGO_SETTINGS_MODULE', None)
+
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', _SCRIPT % module],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    stdout, stderr = process.communicate()
+
+    if process.returncode:
+        raise RuntimeError("Importing %s failed:\n%s" % (module, stderr))
+
+    result = json.loads(stdout.strip().splitlines()[-1])
+    result['importtime'] = [line for line in stderr.splitlines() if line.startswith('import time:')]
+
+    return result
+
+
+def summarize(lines, top=10):
+    """
+    Summarizes -X importtime lines by the self import time of each top level package and module
+
+    :param lines: Lines printed by -X importtime
+    :type lines: list[str]
+
+    :param top: Number of the slowest packages and modules to return
+    :type top: int
+
+    :return: The slowest packages and modules as (name, microseconds) sorted by time
+    :rtype: (list[(str, int)], list[(str, int)])
+    """
+    packages = {}
+    modules = []
+
+    for line in lines:
+        try:
+            self_time, cumulative, name = line[len('import time:'):].split('|')
+            self_time = int(self_time)
+        except ValueError:
+            # The header line
+            continue
+
+        name = name.strip()
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_time
+        modules.append((name, self_time))
+
+    def slowest(items):
+        return sorted(items, key=lambda item: item[1], reverse=True)[:top]
+
+    return slowest(packages.items()), slowest(modules)
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from .models import Game
+from .pubsub import get_pubsub
+from .renderers import event
+from .score import finished
+from .serializers import score_data
+
+# Comment line sent when no event was sent for STREAM_HEARTBEAT seconds so proxies keep the connection open
+HEARTBEAT = b': heartbeat\n\n'
+
+
+def score_event(game, since=None):
+    """
+    Renders the score event of a game with all the frames
+    or only the frames changed since the game had since rolls
+
+    :param game: The game
+    :type game: Game
+
+    :param since: Number of rolls already sent to the client or None
+    :type since: int|None
+
+    :rtype: bytes
+
+    :raises ValidationError: If the game cannot be scored
+    """
+    if since is not None and since > game.rolls_count:
+        since = None
+
+    data = score_data(game.pk, game.score() if since is None else game.score_since(since))
+    data['rolls_count'] = game.rolls_count
+
+    if since is not None:
+        data['since'] = since
+
+    return event('score', data, game.rolls_count)
+
+
+def last_event_id(value):
+    """
+    Parses the Last-Event-ID header
+
+    :param value: Header value or None
+    :type value: str|None
+
+    :return: Number of rolls already sent to the client or None
+    :rtype: int|None
+    """
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def stream(pk, since=None):
+    """
+    Generates the events of a game: the score when it starts and the changed frames after each roll.
+    The rolls are noticed from the pub/sub messages or by reading the game again after STREAM_POLL seconds
+    without a message, a heartbeat is sent after STREAM_HEARTBEAT seconds without an event.
+    It ends when the game is finished.
+
+    :param pk: Game id
+    :type pk: int
+
+    :param since: Number of rolls already sent to the client or None
+    :type since: int|None
+
+    :rtype: collections.Iterable[bytes]
+    """
+    pubsub = get_pubsub()
+    # Subscribe before reading the game so no roll is missed
+    subscription = pubsub.subscribe(pk)
+
+    timeout = False
+    written = time.monotonic()
+
+    try:
+        while True:
+            game = Game.objects.filter(pk=pk).first()
+
+            if game is None:
+                return
+
+            if since != game.rolls_count:
+                try:
+                    yield score_event(game, since)
+                except ValidationError as e:
+                    yield event('error', e.detail)
+                    return
+
+                since = game.rolls_count
+                written = time.monotonic()
+            elif timeout and time.monotonic() - written >= settings.STREAM_HEARTBEAT:
+                yield HEARTBEAT
+                written = time.monotonic()
+
+            if finished(game.state):
+                return
+
+            # Skip the messages about rolls already sent. A timeout reads the game again
+            # so the stream also gets the rolls published by another process.
+            rolls_count = subscription.get(settings.STREAM_POLL)
+
+            while rolls_count is not None and rolls_count <= since:
+                rolls_count = subscription.get(settings.STREAM_POLL)
+
+            timeout = rolls_count is None
+    finally:
+        pubsub.unsubscribe(subscription)
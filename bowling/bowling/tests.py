@@ -1,16 +1,61 @@
+import asyncio
+import contextlib
 import copy
+import functools
+import importlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
 import sys
-
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.test.client import Client
-
-from .score import generate, MAX_PINS, MAX_FRAMES
-
-
-def get(url, data=None):
+from django.test.utils import CaptureQueriesContext
+
+from . import benchmark, metrics
+from .cache import get_score, stats
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .exceptions import Conflict
+from .importer import JSONL_FORMAT, import_games
+from .loadtest import tournament
+from .models import Game, Roll, pack_rolls, unpack_rolls
+from .pubsub import LocalPubSub, get_pubsub
+from .renderers import FastJSONRenderer
+from .serializers import ScoreSerializer, score_data
+from .startup import measure, summarize
+from .score import generate, generate_many, advance, finished, iter_frames, next_roll, \
+    summarize as summarize_rolls, INITIAL_STATE, PAD, State, MAX_PINS, MAX_FRAMES, TABLE_ENGINE, MEMO_ENGINE, PrefixMemo
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from . import asgi
+except ImportError:
+    asgi = None
+
+
+def get(url, data=None, **extra):
     client = Client()
-    return client.get(url, data)
+    return client.get(url, data, **extra)
 
 
 def post(url, data=None):
@@ -18,6 +63,11 @@ def post(url, data=None):
     return client.post(url, data)
 
 
+def data(response):
+    """Returns the parsed JSON content of a response"""
+    return json.loads(response.content.decode('utf-8'))
+
+
 def generate_rolls(expected):
     return expected, [r2 for r1 in expected for r2 in r1['rolls']]
 
@@ -151,6 +201,47 @@ class ScoreTestCase(TestCase):
         score = generate(rolls)
         validate_score(self, expected, score)
 
+    def test_strike_and_open_rolls_in_last_frame(self):
+        expected, rolls = generate_rolls([
+            {'rolls': [0, 0], 'score': 0, 'number': 1},
+            {'rolls': [0, 0], 'score': 0, 'number': 2},
+            {'rolls': [0, 0], 'score': 0, 'number': 3},
+            {'rolls': [0, 0], 'score': 0, 'number': 4},
+            {'rolls': [0, 0], 'score': 0, 'number': 5},
+            {'rolls': [0, 0], 'score': 0, 'number': 6},
+            {'rolls': [0, 0], 'score': 0, 'number': 7},
+            {'rolls': [0, 0], 'score': 0, 'number': 8},
+            {'rolls': [10], 'score': 25, 'strike': True, 'number': 9},
+            {'rolls': [10, 5, 3], 'score': 43, 'strike': True, 'number': 10}
+        ])
+
+        score = generate(rolls)
+        validate_score(self, expected, score)
+
+    def test_uncompleted_strike_in_last_frame(self):
+        expected, rolls = generate_rolls([
+            {'rolls': [10], 'score': 30, 'strike': True, 'number': 1},
+            {'rolls': [10], 'score': 60, 'strike': True, 'number': 2},
+            {'rolls': [10], 'score': 90, 'strike': True, 'number': 3},
+            {'rolls': [10], 'score': 120, 'strike': True, 'number': 4},
+            {'rolls': [10], 'score': 150, 'strike': True, 'number': 5},
+            {'rolls': [10], 'score': 180, 'strike': True, 'number': 6},
+            {'rolls': [10], 'score': 210, 'strike': True, 'number': 7},
+            {'rolls': [10], 'score': 240, 'strike': True, 'number': 8},
+            {'rolls': [10], 'score': 270, 'strike': True, 'number': 9},
+            {'rolls': [10, 10], 'score': 290, 'strike': True, 'completed': False, 'number': 10}
+        ])
+
+        score = generate(rolls)
+        validate_score(self, expected, score)
+
+    def test_more_then_max_pins_after_strike_in_last_frame(self):
+        rolls = [
+            0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+            10, 5, 6
+        ]
+        self.assertRaises(Exception, generate, rolls)
+
     def test_more_then_max_pins_in_a_roll(self):
         self.assertRaises(Exception, generate, [MAX_PINS + 1])
 
@@ -189,18 +280,405 @@ class ScoreTestCase(TestCase):
         self.assertRaises(Exception, generate, rolls)
 
 
+class StateTestCase(TestCase):
+    def advance_rolls(self, rolls):
+        state = INITIAL_STATE
+
+        for roll in rolls:
+            state = advance(state, roll)
+
+        return state
+
+    def assertSameAsGenerate(self, rolls):
+        frames = generate(rolls)
+        state = self.advance_rolls(rolls)
+
+        self.assertEqual(state.rolls_count, len(rolls), msg="Invalid rolls count")
+        self.assertEqual(state.total, frames[-1].score if frames else 0, msg="Invalid total")
+        self.assertEqual(
+            finished(state),
+            bool(frames) and frames[-1].end_frame and frames[-1].completed,
+            msg="Invalid finished"
+        )
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+    def test_all_strikes(self):
+        rolls = [MAX_PINS] * 12
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+    def test_strike_and_open_rolls_in_last_frame(self):
+        self.assertSameAsGenerate([0] * 16 + [10, 10, 5, 3])
+
+    def test_more_then_max_pins_in_a_roll(self):
+        self.assertRaisesMessage(Exception, "Invalid pins!", self.advance_rolls, [MAX_PINS + 1])
+
+    def test_negative_roll(self):
+        self.assertRaisesMessage(Exception, "Invalid pins!", self.advance_rolls, [-1])
+        self.assertRaisesMessage(Exception, "Invalid pins!", generate, [-1])
+        self.assertRaisesMessage(Exception, "Invalid pins!", generate, [-1], TABLE_ENGINE)
+
+    def test_replay_invalid_rolls(self):
+        """Test the state migration scores a game with invalid rolls up to its last valid roll"""
+        replay_rolls = importlib.import_module('bowling.migrations.0002_game_state').replay_rolls
+        game = Game.objects.create()
+
+        for seq, roll in enumerate([6, 6, 1]):
+            Roll.objects.create(game=game, seq=seq, roll=roll)
+
+        with self.assertLogs('bowling.migrations.0002_game_state', 'WARNING'):
+            replay_rolls(django_apps, None)
+
+        self.assertEqual(Game.objects.get(pk=game.pk).state, advance(INITIAL_STATE, 6), msg="Invalid state")
+
+        importlib.import_module('bowling.migrations.0003_game_packed_rolls').pack_existing_rolls(django_apps, None)
+        self.assertEqual(Game.objects.get(pk=game.pk).packed_rolls, '6', msg="Invalid packed rolls")
+
+        # The rolls after the scored ones are not numbered so the next audited roll is saved
+        with self.assertLogs('bowling.migrations.0004_roll_seq', 'WARNING'):
+            importlib.import_module('bowling.migrations.0004_roll_seq').number_existing_rolls(django_apps, None)
+
+        self.assertEqual(list(game.rolls.order_by('seq').values_list('seq', 'roll')), [(0, 6)], msg="Invalid rolls")
+
+        with override_settings(ROLL_AUDIT=True):
+            Game.objects.get(pk=game.pk).add_roll(4)
+
+        self.assertEqual(list(game.rolls.order_by('seq').values_list('seq', 'roll')), [(0, 6), (1, 4)],
+                         msg="Invalid audited rolls")
+
+    def test_replay_same_as_advance(self):
+        """Test the copy of the scoring rules in the state migration scores like advance()"""
+        migration = importlib.import_module('bowling.migrations.0002_game_state')
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for rolls in (rolls, [MAX_PINS] * 12, [0] * 18 + [4, 6, 10], [MAX_PINS - 1, 1] * 10 + [5]):
+            state = migration.INITIAL_STATE
+
+            for roll in rolls:
+                state = migration.advance(state, roll)
+
+            self.assertEqual(State(**state), self.advance_rolls(rolls), msg="Invalid state after %s" % rolls)
+
+    def test_more_then_max_pins_in_a_frame(self):
+        self.assertRaisesMessage(Exception, "Exceeded maximum pins for a frame!", self.advance_rolls, [MAX_PINS - 1, 2])
+
+    def test_more_than_max_frames(self):
+        self.assertRaisesMessage(Exception, "You cannot have more than a %d frames in a game!" % MAX_FRAMES,
+                                 self.advance_rolls, [MAX_PINS] * 13)
+
+
+class NextRollTestCase(TestCase):
+    def assertSameAsAdvance(self, rolls):
+        state = functools.reduce(advance, rolls, INITIAL_STATE)
+        allowed = next_roll(state)
+
+        self.assertEqual(allowed.finished, finished(state), msg="Invalid finished")
+
+        for roll in range(-1, MAX_PINS + 2):
+            legal = not allowed.finished and allowed.min_pins <= roll <= allowed.max_pins
+
+            try:
+                advance(state, roll)
+            except Exception:
+                self.assertFalse(legal, msg="Roll %d after %s is not legal" % (roll, rolls))
+            else:
+                self.assertTrue(legal, msg="Roll %d after %s is legal" % (roll, rolls))
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsAdvance(rolls[:index])
+
+    def test_last_frame(self):
+        for rolls in ([0] * 18 + [10, 10, 10], [0] * 18 + [10, 3, 7], [0] * 18 + [4, 6, 10], [0] * 18 + [4, 5]):
+            for index in range(len(rolls) + 1):
+                self.assertSameAsAdvance(rolls[:index])
+
+
+class PackTestCase(TestCase):
+    def test_pack_rolls(self):
+        rolls = list(range(MAX_PINS + 1))
+        self.assertEqual(pack_rolls(rolls), '0123456789X', msg="Invalid packed rolls")
+        self.assertEqual(unpack_rolls(pack_rolls(rolls)), rolls, msg="Invalid unpacked rolls")
+        self.assertRaisesMessage(ValueError, "Invalid pins!", pack_rolls, [-1])
+        self.assertRaisesMessage(ValueError, "Invalid pins!", pack_rolls, [MAX_PINS + 1])
+
+    def test_negative_roll(self):
+        game = Game.objects.create()
+        self.assertRaises(ValidationError, game.add_roll, -1)
+
+        game = Game.objects.get(pk=game.pk)
+        self.assertEqual((game.packed_rolls, game.total), ('', 0), msg="Negative roll saved")
+
+
+class TableEngineTestCase(TestCase):
+    engine = TABLE_ENGINE
+    memo = None
+
+    def assertSameAsGenerate(self, rolls):
+        try:
+            expected = generate(rolls)
+        except Exception as e:
+            self.assertRaisesMessage(Exception, str(e), generate, rolls, self.engine, self.memo)
+            return
+
+        frames = generate(rolls, self.engine, self.memo)
+        validate_score(self, [{
+            'rolls': frame.rolls,
+            'number': frame.number,
+            'score': frame.score,
+            'strike': frame.strike,
+            'spare': frame.spare,
+            'completed': frame.completed
+        } for frame in expected], frames)
+
+        for frame, expected_frame in zip(frames, expected):
+            self.assertEqual(frame.rolls_completed, expected_frame.rolls_completed, msg="Not rolls completed")
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+    def test_all_strikes(self):
+        rolls = [MAX_PINS] * 12
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+    def test_last_frame(self):
+        for rolls in ([0] * 18 + [10, 0, 5], [0] * 18 + [10, 5, 3], [0] * 18 + [0, 10, 10], [0] * 16 + [10, 10, 10]):
+            for index in range(len(rolls) + 1):
+                self.assertSameAsGenerate(rolls[:index])
+
+    def test_invalid_games(self):
+        self.assertSameAsGenerate([MAX_PINS + 1])
+        self.assertSameAsGenerate([MAX_PINS - 1, 2])
+        self.assertSameAsGenerate([MAX_PINS] * 13)
+        self.assertSameAsGenerate([1, 0] * 10 + [1])
+        self.assertSameAsGenerate([0] * 18 + [10, 5, 6])
+
+
+class MemoEngineTestCase(TableEngineTestCase):
+    engine = MEMO_ENGINE
+
+    def setUp(self):
+        self.memo = PrefixMemo(size=1000)
+
+    def test_resume(self):
+        """Test scoring resumes from the deepest known prefix"""
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        generate(rolls[:10], self.engine, self.memo)
+        validate_score(self, expected, generate(rolls, self.engine, self.memo))
+
+        stats = self.memo.stats()
+        self.assertEqual(stats['lookups'], 2, msg="Invalid lookups")
+        self.assertEqual(stats['hit_rate'], 0.5, msg="Invalid hit rate")
+        self.assertEqual(stats['resumed_rate'], 10.0 / (10 + len(rolls)), msg="Invalid resumed rate")
+        self.assertEqual(stats['prefixes'], len(rolls), msg="Invalid prefixes")
+        self.assertGreater(stats['bytes'], 0, msg="Invalid memory")
+
+    def test_eviction(self):
+        """Test a small memo keeps at most its size of prefixes and still scores correctly"""
+        self.memo = PrefixMemo(size=5)
+
+        for rolls in ([MAX_PINS] * 12, [1, 2] * 10, [MAX_PINS] * 6 + [0] * 8, [1, 2, 3]):
+            self.assertSameAsGenerate(rolls)
+            self.assertLessEqual(self.memo.stats()['prefixes'], 5, msg="Memo over its size")
+
+        self.assertGreater(self.memo.stats()['evictions'], 0, msg="Nothing evicted")
+
+        self.memo = PrefixMemo(size=0)
+        self.assertSameAsGenerate([MAX_PINS] * 12)
+        self.assertEqual(self.memo.stats()['prefixes'], 0, msg="Disabled memo kept prefixes")
+
+    def test_bytes(self):
+        """Test the memory of the evicted prefixes is released from the stats"""
+        self.memo = PrefixMemo(size=50)
+
+        for first in range(MAX_PINS):
+            for second in range(MAX_PINS - first):
+                generate([first, second, 1, 2], self.engine, self.memo)
+
+        self.assertGreater(self.memo.stats()['bytes'], 0, msg="Invalid bytes")
+
+        # Drain the memo
+        self.memo.size = 0
+        generate([], self.engine, self.memo)
+        self.assertEqual(self.memo.stats()['prefixes'], 0, msg="Invalid prefixes")
+        self.assertEqual(self.memo.stats()['bytes'], 0, msg="Invalid bytes")
+
+    def prefixes(self):
+        """Returns the prefixes kept by the memo"""
+        prefixes = []
+        nodes = [((), self.memo._root)]
+
+        while nodes:
+            prefix, node = nodes.pop()
+            prefixes.extend(prefix + (roll,) for roll in node.children)
+            nodes.extend((prefix + (roll,), child) for roll, child in node.children.items())
+
+        return sorted(prefixes)
+
+    def test_eviction_order(self):
+        """Test the longest prefixes are evicted first and a shared prefix is kept"""
+        self.memo = PrefixMemo(size=5)
+
+        generate([1, 2, 3, 4, 5], self.engine, self.memo)
+        generate([6], self.engine, self.memo)
+        self.assertEqual(self.prefixes(), [(1,), (1, 2), (1, 2, 3), (1, 2, 3, 4), (6,)], msg="Invalid prefixes")
+        self.assertEqual(self.memo.stats()['evictions'], 1, msg="Invalid evictions")
+
+        # The game resumes from its longest kept prefix and the least recently used leaf (6,) is evicted
+        generate([1, 2, 3, 4, 5], self.engine, self.memo)
+        self.assertEqual(self.memo.resumed_rolls, 4, msg="Invalid resumed rolls")
+        self.assertEqual(self.prefixes(), [(1,), (1, 2), (1, 2, 3), (1, 2, 3, 4), (1, 2, 3, 4, 5)],
+                         msg="Invalid prefixes")
+
+        # A game longer than the memo keeps its shortest prefixes
+        self.memo = PrefixMemo(size=3)
+        generate([MAX_PINS] * 12, self.engine, self.memo)
+        self.assertEqual(self.prefixes(), [(MAX_PINS,) * length for length in (1, 2, 3)], msg="Invalid prefixes")
+
+
+class SummaryTestCase(TestCase):
+    def assertSameAsGenerate(self, rolls):
+        try:
+            frames = generate(rolls)
+        except Exception as e:
+            self.assertRaisesMessage(Exception, str(e), summarize_rolls, rolls)
+            return
+
+        summary = summarize_rolls(rolls)
+        state = functools.reduce(advance, rolls, INITIAL_STATE)
+
+        self.assertEqual(summary.total, frames[-1].score if frames else 0, msg="Invalid total")
+        self.assertEqual(summary.frame, state.frame, msg="Invalid frame")
+        self.assertEqual(summary.finished, finished(state), msg="Invalid finished")
+        self.assertEqual(summary.rolls_count, len(rolls), msg="Invalid rolls count")
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+        self.assertEqual(summarize_rolls(rolls), (133, MAX_FRAMES, True, len(rolls)), msg="Invalid summary")
+
+    def test_all_strikes(self):
+        rolls = [MAX_PINS] * 12
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsGenerate(rolls[:index])
+
+    def test_last_frame(self):
+        for rolls in ([0] * 18 + [10, 0, 5], [0] * 18 + [5, 5, 3], [0] * 18 + [1, 2], [0] * 16 + [10, 10, 10]):
+            for index in range(len(rolls) + 1):
+                self.assertSameAsGenerate(rolls[:index])
+
+    def test_invalid_games(self):
+        self.assertSameAsGenerate([MAX_PINS + 1])
+        self.assertSameAsGenerate([MAX_PINS - 1, 2])
+        self.assertSameAsGenerate([MAX_PINS] * 13)
+        self.assertSameAsGenerate([1, 0] * 10 + [1])
+
+    def test_iter_frames(self):
+        """Test the frames are generated lazily, the rolls after the read frames are not scored"""
+        frames = iter_frames([1, 4, 10, MAX_PINS + 1])
+        frame = next(frames)
+
+        self.assertEqual((frame.number, frame.rolls, frame.score), (1, [1, 4], 5), msg="Invalid first frame")
+        self.assertRaisesMessage(Exception, "Invalid pins!", next, frames)
+
+
+@unittest.skipUnless(numpy, "numpy is not installed")
+class BatchTestCase(TestCase):
+    def assertSameAsGenerate(self, games):
+        width = max(len(rolls) for rolls in games)
+        batch = generate_many([rolls + [PAD] * (width - len(rolls)) for rolls in games])
+
+        for index, rolls in enumerate(games):
+            try:
+                frames = generate(rolls)
+            except Exception:
+                self.assertFalse(batch.valid[index], msg="Valid game %d" % index)
+                continue
+
+            self.assertTrue(batch.valid[index], msg="Invalid game %d" % index)
+            self.assertEqual(batch.frames[index], len(frames), msg="Different frame length %d" % index)
+            validate_score(self, [{
+                'rolls': frame.rolls,
+                'number': frame.number,
+                'score': batch.score[index][frame_index],
+                'strike': batch.strike[index][frame_index],
+                'spare': batch.spare[index][frame_index],
+                'completed': batch.completed[index][frame_index]
+            } for frame_index, frame in enumerate(frames)], frames)
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        self.assertSameAsGenerate([rolls[:index] for index in range(len(rolls) + 1)])
+
+    def test_all_strikes(self):
+        rolls = [MAX_PINS] * 12
+        self.assertSameAsGenerate([rolls[:index] for index in range(len(rolls) + 1)])
+
+    def test_last_frame(self):
+        self.assertSameAsGenerate([
+            [0] * 18 + [10, 0, 5],
+            [0] * 18 + [10, 5, 3],
+            [0] * 18 + [0, 10, 10],
+            [0] * 16 + [10, 10, 10],
+        ])
+
+    def test_invalid_games(self):
+        self.assertSameAsGenerate([
+            [MAX_PINS + 1],
+            [MAX_PINS - 1, 2],
+            [MAX_PINS] * 13,
+            [1, 0] * 10 + [1],
+            [5] * 20 + [10, 1],
+            [0] * 18 + [10, 5, 6],
+            [65536 + 5],
+        ])
+
+        # Any negative value is padding, even one which would wrap to a valid roll in int16
+        batch = generate_many([[5, -65536 + 5]])
+        self.assertTrue(batch.valid[0], msg="Invalid game")
+        self.assertEqual(batch.score[0][0], 5, msg="Padding scored as a roll")
+
+    def test_empty_batch(self):
+        batch = generate_many(numpy.zeros((0, 0), dtype=int))
+
+        self.assertEqual(batch.valid.shape, (0,), msg="Invalid valid shape")
+        self.assertEqual(batch.score.shape, (0, MAX_FRAMES), msg="Invalid score shape")
+        self.assertEqual(generate_many([]).frames.shape, (0,), msg="Invalid frames shape")
+
+
 class RESTTestCase(TestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
     def test_create_game_success(self):
         response = post(reverse('game'))
 
         self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
-        self.assertIn("game", response.data, msg="No game field in response!")
-        self.assertGreater(response.data['game'], 0, msg="Invalid game %d" % response.data['game'])
+        self.assertIn("game", data(response), msg="No game field in response!")
+        self.assertGreater(data(response)['game'], 0, msg="Invalid game %d" % data(response)['game'])
 
     def test_get_invalid_game(self):
         response = get(reverse('game'), {'game': sys.maxsize})
         self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
-        self.assertIn("game", response.data, msg="No game error field")
+        self.assertIn("game", data(response), msg="No game error field")
 
     def test_delasport_rolls(self):
         game_response = post(reverse('game'))
@@ -211,15 +689,45 @@ class RESTTestCase(TestCase):
 
         for roll in rolls:
             roll_response = post(reverse('roll'), {
-                'game': game_response.data['game'],
+                'game': data(game_response)['game'],
                 'roll': roll
             })
 
             self.assertEqual(roll_response.status_code, 200, msg="Invalid status code %d" % roll_response.status_code)
-            score = roll_response.data['score']
+            score = data(roll_response)['score']
 
         validate_score(self, expected, score)
 
+        game = Game.objects.get(pk=data(game_response)['game'])
+        self.assertEqual(unpack_rolls(game.packed_rolls), rolls, msg="Invalid packed rolls")
+        self.assertEqual(game.rolls_count, len(rolls), msg="Invalid rolls count")
+        self.assertEqual(game.total, expected[-1]['score'], msg="Invalid total")
+
+    @override_settings(SCORE_ENGINE=TABLE_ENGINE)
+    def test_delasport_rolls_table_engine(self):
+        self.test_delasport_rolls()
+
+    @override_settings(SCORE_ENGINE=MEMO_ENGINE, SCORE_MEMO_SIZE=100)
+    def test_delasport_rolls_memo_engine(self):
+        self.test_delasport_rolls()
+
+    @override_settings(ROLL_AUDIT=True)
+    def test_delasport_rolls_audit(self):
+        self.test_delasport_rolls()
+
+        game = Game.objects.latest('pk')
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        self.assertEqual(list(game.rolls.order_by('seq').values_list('roll', flat=True)), rolls, msg="Invalid rolls")
+        self.assertEqual(list(game.rolls.order_by('seq').values_list('seq', flat=True)), list(range(len(rolls))),
+                         msg="Invalid roll sequence")
+
+    def test_duplicate_roll_seq(self):
+        game = Game.objects.create()
+        Roll.objects.create(game=game, seq=0, roll=1)
+
+        with transaction.atomic():
+            self.assertRaises(IntegrityError, Roll.objects.create, game=game, seq=0, roll=2)
+
     def test_more_than_max_frames(self):
         game_response = post(reverse('game'))
         self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
@@ -231,7 +739,7 @@ class RESTTestCase(TestCase):
 
         for index, roll in enumerate(rolls):
             roll_response = post(reverse('roll'), {
-                'game': game_response.data['game'],
+                'game': data(game_response)['game'],
                 'roll': roll
             })
 
@@ -244,32 +752,32 @@ class RESTTestCase(TestCase):
         self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
 
         roll_response = post(reverse('roll'), {
-            'game': game_response.data['game'],
+            'game': data(game_response)['game'],
             'roll': MAX_PINS + 1
         })
 
         self.assertGreaterEqual(roll_response.status_code, 400,
                                 msg="Invalid status code %d" % roll_response.status_code)
-        self.assertIn("roll", roll_response.data, msg="No roll error message in response")
+        self.assertIn("roll", data(roll_response), msg="No roll error message in response")
 
     def test_more_then_max_pins_in_a_frame(self):
         game_response = post(reverse('game'))
         self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
 
         roll_response1 = post(reverse('roll'), {
-            'game': game_response.data['game'],
+            'game': data(game_response)['game'],
             'roll': MAX_PINS - 1
         })
         self.assertEqual(roll_response1.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
 
         roll_response2 = post(reverse('roll'), {
-            'game': game_response.data['game'],
+            'game': data(game_response)['game'],
             'roll': 2
         })
 
         self.assertGreaterEqual(roll_response2.status_code, 400,
                                 msg="Invalid status code %d" % roll_response2.status_code)
-        self.assertIn("roll", roll_response2.data, msg="No roll error message in response")
+        self.assertIn("roll", data(roll_response2), msg="No roll error message in response")
 
     def test_all_strike(self):
         game_response = post(reverse('game'))
@@ -279,12 +787,1126 @@ class RESTTestCase(TestCase):
 
         for index, roll in enumerate(rolls):
             roll_response = post(reverse('roll'), {
-                'game': game_response.data['game'],
+                'game': data(game_response)['game'],
                 'roll': roll
             })
 
             self.assertEqual(roll_response.status_code, 200, msg="Invalid status code %d" % roll_response.status_code)
 
             if index == len(rolls) - 1:
-                self.assertEqual(len(roll_response.data['score']), MAX_FRAMES, msg="Invalid number of frames!")
-                self.assertEqual(roll_response.data['score'][9]['score'], 300, msg="Invalid score!")
\ No newline at end of file
+                self.assertEqual(len(data(roll_response)['score']), MAX_FRAMES, msg="Invalid number of frames!")
+                self.assertEqual(data(roll_response)['score'][9]['score'], 300, msg="Invalid score!")
+
+    def test_delasport_bulk_rolls(self):
+        game_response = post(reverse('game'))
+        self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
+
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        rolls_response = post(reverse('rolls'), {
+            'game': data(game_response)['game'],
+            'rolls': rolls[:10]
+        })
+        self.assertEqual(rolls_response.status_code, 200, msg="Invalid status code %d" % rolls_response.status_code)
+
+        rolls_response = post(reverse('rolls'), {
+            'game': data(game_response)['game'],
+            'rolls': rolls[10:]
+        })
+        self.assertEqual(rolls_response.status_code, 200, msg="Invalid status code %d" % rolls_response.status_code)
+
+        validate_score(self, expected, data(rolls_response)['score'])
+
+    def test_bulk_rolls_invalid_roll(self):
+        game_response = post(reverse('game'))
+        self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
+
+        rolls_response = post(reverse('rolls'), {
+            'game': data(game_response)['game'],
+            'rolls': [1, 4, MAX_PINS - 1, 2]
+        })
+
+        self.assertGreaterEqual(rolls_response.status_code, 400,
+                                msg="Invalid status code %d" % rolls_response.status_code)
+        self.assertIn('3', data(rolls_response)['rolls'], msg="No roll index in error message")
+        self.assertEqual(Game.objects.get(pk=data(game_response)['game']).packed_rolls, '', msg="Rolls are saved")
+
+    def test_bulk_rolls_more_then_max_pins_in_a_roll(self):
+        game_response = post(reverse('game'))
+        self.assertEqual(game_response.status_code, 200, msg="Invalid status code %d" % game_response.status_code)
+
+        rolls_response = post(reverse('rolls'), {
+            'game': data(game_response)['game'],
+            'rolls': [1, MAX_PINS + 1]
+        })
+
+        self.assertGreaterEqual(rolls_response.status_code, 400,
+                                msg="Invalid status code %d" % rolls_response.status_code)
+        self.assertIn('1', data(rolls_response)['rolls'], msg="No roll index in error message")
+
+    def test_get_many_games(self):
+        game_response1 = post(reverse('game'))
+        game_response2 = post(reverse('game'))
+
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        post(reverse('rolls'), {
+            'game': data(game_response1)['game'],
+            'rolls': rolls
+        })
+
+        response = get(reverse('game'), {'game': '%d,%d,%d' % (
+            data(game_response1)['game'],
+            sys.maxsize,
+            data(game_response2)['game']
+        )})
+
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(len(data(response)), 3, msg="Invalid number of games")
+
+        self.assertEqual(data(response)[0]['game'], data(game_response1)['game'], msg="Invalid game")
+        validate_score(self, expected, data(response)[0]['score'])
+
+        self.assertEqual(data(response)[1]['game'], sys.maxsize, msg="Invalid game")
+        self.assertIn("game", data(response)[1]['errors'], msg="No game error field")
+
+        self.assertEqual(data(response)[2]['game'], data(game_response2)['game'], msg="Invalid game")
+        self.assertEqual(data(response)[2]['score'], [], msg="Invalid score")
+
+    def test_summary(self):
+        game = data(post(reverse('game')))['game']
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        post(reverse('rolls'), {'game': game, 'rolls': rolls[:-1]})
+
+        response = get(reverse('game'), {'game': game, 'view': 'summary'})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response), {
+            'game': game, 'total': 127, 'frame': MAX_FRAMES, 'finished': False, 'rolls_count': len(rolls) - 1
+        }, msg="Invalid summary")
+        self.assertNotEqual(response['ETag'], get(reverse('game'), {'game': game})['ETag'], msg="Same ETag as the frames")
+
+        not_modified_response = get(reverse('game'), {'game': game, 'view': 'summary'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified_response.status_code, 304, msg="Not modified expected")
+
+        response = get(reverse('game'), {'game': '%d,%d' % (game, sys.maxsize), 'view': 'summary'})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response)[0]['total'], 127, msg="Invalid total")
+        self.assertIn("game", data(response)[1]['errors'], msg="No game error field")
+
+        response = get(reverse('game'), {'game': game, 'view': 'frame'})
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+        self.assertIn("view", data(response), msg="No view error field")
+
+    def test_next_roll(self):
+        game = data(post(reverse('game')))['game']
+
+        response = get(reverse('roll'), {'game': game})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response), {
+            'game': game, 'frame': 1, 'rolls_count': 0, 'min_pins': 0, 'max_pins': MAX_PINS, 'finished': False
+        }, msg="Invalid next roll")
+
+        post(reverse('roll'), {'game': game, 'roll': 3})
+        self.assertEqual(data(get(reverse('roll'), {'game': game}))['max_pins'], MAX_PINS - 3, msg="Invalid max pins")
+
+        post(reverse('rolls'), {'game': game, 'rolls': [7] + [MAX_PINS] * 11})
+        response = get(reverse('roll'), {'game': game})
+        self.assertEqual((data(response)['min_pins'], data(response)['max_pins']), (None, None), msg="Invalid pins")
+        self.assertTrue(data(response)['finished'], msg="Not finished")
+
+        response = get(reverse('roll'), {'game': sys.maxsize})
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+        self.assertIn("game", data(response), msg="No game error field")
+
+    def test_get_many_games_invalid_ids(self):
+        response = get(reverse('game'), {'game': '1,a'})
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+        self.assertIn("game", data(response), msg="No game error field")
+
+
+class ConcurrencyTestCase(TransactionTestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_stale_game(self):
+        game = Game.objects.create()
+        stale = Game.objects.get(pk=game.pk)
+
+        game.add_roll(MAX_PINS - 1)
+        self.assertRaises(Conflict, stale.add_roll, MAX_PINS - 1)
+
+        game = Game.objects.get(pk=game.pk)
+        self.assertEqual(unpack_rolls(game.packed_rolls), [MAX_PINS - 1], msg="Invalid rolls")
+
+    @override_settings(ROLL_AUDIT=True)
+    def test_concurrent_rolls(self):
+        game = Game.objects.create()
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        responses = []
+
+        def roll():
+            try:
+                barrier.wait()
+                responses.append(post(reverse('roll'), {'game': game.pk, 'roll': MAX_PINS - 1}))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=roll) for index in range(threads_count)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        codes = [response.status_code for response in responses]
+        self.assertEqual(len(codes), threads_count, msg="Missing responses")
+        self.assertEqual(codes.count(200), 1, msg="Invalid status codes %s" % codes)
+        self.assertEqual(codes.count(409) + codes.count(400), threads_count - 1, msg="Invalid status codes %s" % codes)
+
+        game = Game.objects.get(pk=game.pk)
+        self.assertEqual(unpack_rolls(game.packed_rolls), [MAX_PINS - 1], msg="Invalid rolls")
+        self.assertEqual(game.rolls.count(), 1, msg="Invalid audit rolls")
+
+
+class CacheTestCase(TestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_cached_score(self):
+        game_response = post(reverse('game'))
+        game = data(game_response)['game']
+        self.assertIsNotNone(get_score(game, 0), msg="Score is not cached")
+
+        before = stats()
+        response = get(reverse('game'), {'game': game})
+        after = stats()
+
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response), data(game_response), msg="Invalid cached score")
+        self.assertEqual(after['hits'] - before['hits'], 1, msg="Invalid cache hits")
+        self.assertEqual(after['misses'] - before['misses'], 0, msg="Invalid cache misses")
+
+    def test_roll_invalidates_score(self):
+        game = data(post(reverse('game')))['game']
+        roll_response = post(reverse('roll'), {'game': game, 'roll': MAX_PINS})
+
+        self.assertIsNone(get_score(game, 0), msg="Old score is cached")
+        self.assertIsNotNone(get_score(game, 1), msg="Score is not cached")
+
+        response = get(reverse('game'), {'game': game})
+        self.assertEqual(data(response), data(roll_response), msg="Invalid cached score")
+        self.assertEqual(data(response)['score'][0]['rolls'], [MAX_PINS], msg="Invalid rolls")
+
+
+class ETagTestCase(TestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_not_modified(self):
+        game = data(post(reverse('game')))['game']
+        response = get(reverse('game'), {'game': game})
+        self.assertTrue(response.has_header('ETag'), msg="No ETag header")
+
+        with self.assertNumQueries(1):
+            not_modified_response = get(reverse('game'), {'game': game}, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified_response.status_code, 304,
+                         msg="Invalid status code %d" % not_modified_response.status_code)
+        self.assertEqual(not_modified_response['ETag'], response['ETag'], msg="Invalid ETag")
+
+    def test_modified(self):
+        game = data(post(reverse('game')))['game']
+        response = get(reverse('game'), {'game': game})
+        post(reverse('roll'), {'game': game, 'roll': MAX_PINS})
+
+        modified_response = get(reverse('game'), {'game': game}, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified_response.status_code, 200, msg="Invalid status code %d" % modified_response.status_code)
+        self.assertNotEqual(modified_response['ETag'], response['ETag'], msg="ETag is not changed")
+        self.assertEqual(data(modified_response)['score'][0]['rolls'], [MAX_PINS], msg="Invalid rolls")
+
+    def test_invalid_game(self):
+        response = get(reverse('game'), {'game': sys.maxsize}, HTTP_IF_NONE_MATCH='*')
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+
+
+class DeltaTestCase(TestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_changed_frames_since(self):
+        game = data(post(reverse('game')))['game']
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        post(reverse('rolls'), {'game': game, 'rolls': rolls[:-3]})
+
+        # The 9th frame strike gets its bonus from the 10th frame rolls
+        response = get(reverse('game'), {'game': game, 'since': len(rolls) - 3})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response)['score'], [], msg="Invalid changed frames")
+
+        post(reverse('rolls'), {'game': game, 'rolls': rolls[-3:]})
+
+        response = get(reverse('game'), {'game': game, 'since': len(rolls) - 3})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response)['rolls_count'], len(rolls), msg="Invalid rolls count")
+        validate_score(self, expected[-2:], data(response)['score'])
+
+    def test_roll_since(self):
+        game = data(post(reverse('game')))['game']
+        post(reverse('rolls'), {'game': game, 'rolls': [MAX_PINS, 1, 2]})
+
+        response = post(reverse('roll'), {'game': game, 'roll': 3, 'since': 3})
+        self.assertEqual(response.status_code, 200, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(data(response)['rolls_count'], 4, msg="Invalid rolls count")
+        validate_score(self, [
+            {'rolls': [3], 'score': 19, 'completed': False, 'number': 3}
+        ], data(response)['score'])
+
+    def test_invalid_since(self):
+        game = data(post(reverse('game')))['game']
+
+        response = get(reverse('game'), {'game': game, 'since': 1})
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+        self.assertIn("since", data(response), msg="No since error field")
+
+        response = post(reverse('roll'), {'game': game, 'roll': 1, 'since': 2})
+        self.assertGreaterEqual(response.status_code, 400, msg="Invalid status code %d" % response.status_code)
+        self.assertEqual(Game.objects.get(pk=game).rolls_count, 0, msg="Roll is saved")
+
+
+class RenderTestCase(TestCase):
+    def assertSameAsSerializer(self, rolls):
+        frames = generate(rolls)
+        expected = JSONRenderer().render(ScoreSerializer({'game': 1, 'score': frames}).data)
+
+        self.assertEqual(FastJSONRenderer().render(score_data(1, frames)), expected, msg="Different JSON")
+
+        with mock.patch('bowling.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(score_data(1, frames)), expected, msg="Different JSON")
+
+    def test_delasport(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+
+        for index in range(len(rolls) + 1):
+            self.assertSameAsSerializer(rolls[:index])
+
+    def test_all_strikes(self):
+        self.assertSameAsSerializer([MAX_PINS] * 12)
+
+
+class SettingsTestCase(TestCase):
+    def test_api_settings(self):
+        """Test the API only settings pass the Django system checks"""
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        output = subprocess.check_output(
+            [sys.executable, manage, 'check', '--settings=bowling.settings_api'],
+            stderr=subprocess.STDOUT
+        )
+
+        self.assertIn(b'no issues', output, msg="Invalid checks output")
+
+
+class StartupTestCase(TestCase):
+    def test_startup(self):
+        """Test the WSGI application is imported without opening database connections and its memory is reported"""
+        for module in ('bowling.wsgi', 'bowling.wsgi_api'):
+            result = measure(module)
+
+            self.assertEqual(result['connections'], [], msg="Database connections opened on import of %s" % module)
+            self.assertGreater(result['rss_bytes'], 0, msg="No resident memory of %s" % module)
+
+    @unittest.skipUnless(os.environ.get('BOWLING_STARTUP_BUDGET'), "The wall-clock budget depends on the machine")
+    def test_startup_budget(self):
+        """Test the WSGI application is imported within the budget, set BOWLING_STARTUP_BUDGET=1 to run it"""
+        for module in ('bowling.wsgi', 'bowling.wsgi_api'):
+            result = measure(module)
+
+            self.assertLessEqual(result['seconds'], settings.STARTUP_BUDGET,
+                                 msg="Importing %s took %.3f seconds" % (module, result['seconds']))
+
+    def test_summarize(self):
+        packages, modules = summarize([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |     django.utils',
+            'import time:       300 |        400 |   django',
+            'import time:        50 |         50 | bowling.score',
+        ], top=2)
+
+        self.assertEqual(packages, [('django', 400), ('bowling', 50)], msg="Invalid packages")
+        self.assertEqual(modules, [('django', 300), ('django.utils', 100)], msg="Invalid modules")
+
+
+def asgi_request(method, path, query=b'', body=b'', headers=()):
+    """Sends a request to the ASGI application and returns the status, headers and parsed content"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async def request():
+        await asgi.application({
+            'type': 'http',
+            'http_version': '1.1',
+            'method': method,
+            'path': path,
+            'query_string': query,
+            'headers': list(headers) + [(b'content-length', str(len(body)).encode('latin1'))],
+        }, receive, send)
+
+        return messages
+
+    return asyncio.new_event_loop().run_until_complete(request())
+
+
+def asgi_response(messages):
+    start, body = messages[0], b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict(start['headers']), json.loads(body.decode('utf-8')) if body else None
+
+
+@unittest.skipUnless(asgi, "asgiref is not installed")
+class ASGITestCase(TransactionTestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_game(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        game = Game.objects.create()
+        game.add_rolls(rolls)
+
+        status, headers, content = asgi_response(asgi_request('GET', '/game/', b'game=%d' % game.pk))
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual(content['game'], game.pk, msg="Invalid game")
+        validate_score(self, expected, content['score'])
+
+        status, headers, content = asgi_response(asgi_request(
+            'GET', '/game/', b'game=%d' % game.pk, headers=[(b'if-none-match', headers[b'etag'])]
+        ))
+        self.assertEqual(status, 304, msg="Not modified expected")
+
+        status, headers, content = asgi_response(asgi_request('GET', '/game/', b'game=0'))
+        self.assertEqual(status, 400, msg="Invalid status")
+        self.assertEqual(content, {'game': ["Game does not exist!"]}, msg="Invalid error")
+
+        status, headers, content = asgi_response(asgi_request('GET', '/game/', b'game=%d&view=summary' % game.pk))
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual(content['total'], 133, msg="Invalid total")
+        self.assertTrue(content['finished'], msg="Not finished")
+
+    def test_concurrent_games(self):
+        """Test one event loop serves many score requests at the same time"""
+        games = [Game.objects.create() for index in range(10)]
+
+        for game in games:
+            game.add_roll(game.pk % MAX_PINS)
+
+        async def request(game):
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await asgi.application({
+                'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': '/game/', 'query_string': b'game=%d' % game.pk, 'headers': []
+            }, receive, send)
+
+            return asgi_response(messages)
+
+        async def requests():
+            return await asyncio.gather(*[request(game) for game in games])
+
+        responses = asyncio.new_event_loop().run_until_complete(requests())
+
+        for game, (status, headers, content) in zip(games, responses):
+            self.assertEqual(status, 200, msg="Invalid status")
+            self.assertEqual(content['score'][0]['rolls'], [game.pk % MAX_PINS], msg="Invalid rolls")
+
+    def test_roll(self):
+        game = Game.objects.create()
+        form = [(b'content-type', b'application/x-www-form-urlencoded')]
+
+        status, headers, content = asgi_response(
+            asgi_request('POST', '/roll/', body=b'game=%d&roll=10' % game.pk, headers=form)
+        )
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual(content['score'][0]['rolls'], [MAX_PINS], msg="Invalid rolls")
+
+        status, headers, content = asgi_response(asgi_request(
+            'POST', '/roll/', body=json.dumps({'game': game.pk, 'roll': 4}).encode('utf-8'),
+            headers=[(b'content-type', b'application/json')]
+        ))
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual(content['score'][1]['rolls'], [4], msg="Invalid rolls")
+
+        status, headers, content = asgi_response(
+            asgi_request('POST', '/roll/', body=b'game=%d&roll=7' % game.pk, headers=form)
+        )
+        self.assertEqual(status, 400, msg="Invalid status")
+        self.assertIn('roll', content, msg="Missing roll error")
+
+        status, headers, content = asgi_response(asgi_request('GET', '/roll/', b'game=%d' % game.pk))
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual((content['min_pins'], content['max_pins']), (0, MAX_PINS - 4), msg="Invalid next roll")
+
+        self.assertEqual(unpack_rolls(Game.objects.get(pk=game.pk).packed_rolls), [MAX_PINS, 4], msg="Invalid rolls")
+
+    def test_fallback(self):
+        """Test the requests the async handlers do not serve are passed to Django and since is served"""
+        form = [(b'content-type', b'application/x-www-form-urlencoded')]
+
+        status, headers, content = asgi_response(asgi_request('POST', '/game/', headers=form))
+        self.assertEqual(status, 200, msg="Invalid status")
+        game = content['game']
+
+        status, headers, content = asgi_response(
+            asgi_request('POST', '/roll/', body=b'game=%d&roll=11' % game, headers=form)
+        )
+        self.assertEqual(status, 400, msg="Invalid status")
+        self.assertIn('roll', content, msg="Missing roll error")
+
+        status, headers, content = asgi_response(
+            asgi_request('POST', '/rolls/', body=json.dumps({'game': game, 'rolls': [1, 2]}).encode('utf-8'),
+                         headers=[(b'content-type', b'application/json')])
+        )
+        self.assertEqual(status, 200, msg="Invalid status")
+
+        status, headers, content = asgi_response(asgi_request('GET', '/game/', b'game=%d&since=1' % game))
+        self.assertEqual(status, 200, msg="Invalid status")
+        self.assertEqual(content['since'], 1, msg="Invalid since")
+
+    def test_metrics(self):
+        """Test the requests served by the async handlers are recorded in the metrics"""
+        metrics.clear()
+        self.addCleanup(metrics.clear)
+        game = Game.objects.create()
+
+        asgi_request('POST', '/roll/', body=b'game=%d&roll=3' % game.pk,
+                     headers=[(b'content-type', b'application/x-www-form-urlencoded')])
+        asgi_request('GET', '/game/', b'game=%d' % game.pk)
+        asgi_request('GET', '/roll/', b'game=%d' % game.pk)
+        messages = asgi_request('GET', '/metrics')
+        lines = b''.join(message.get('body', b'') for message in messages[1:]).decode('utf-8').splitlines()
+
+        for endpoint in ('POST roll', 'GET game', 'GET roll'):
+            self.assertIn('bowling_request_seconds_count{endpoint="%s"} 1' % endpoint, lines,
+                          msg="Missing latency of %s" % endpoint)
+
+        # The score is cached by the roll so the game and the next roll are read with a query each
+        for endpoint in ('GET game', 'GET roll'):
+            self.assertIn('bowling_sql_queries_sum{endpoint="%s"} 1.0' % endpoint, lines,
+                          msg="Invalid SQL queries of %s" % endpoint)
+
+        self.assertNotIn('bowling_sql_queries_sum{endpoint="POST roll"} 0.0', lines, msg="Missing SQL queries")
+
+        self.assertIn('bowling_score_seconds_count{endpoint="POST roll"} 1', lines, msg="Missing scoring time")
+
+    def test_same_as_django(self):
+        """Test the async handlers answer like the Django views for valid and invalid parameters"""
+        game = Game.objects.create()
+        game.add_rolls([3, 4, MAX_PINS])
+        client = Client()
+
+        for query in ('game=%d' % game.pk, 'game=%d&view=summary' % game.pk, 'game=%d&since=2' % game.pk,
+                      'game=%d&since=9' % game.pk, 'game=%d,0' % game.pk, 'game=', 'game=x', 'game=%d.5' % game.pk,
+                      'game=0', 'game=%d&view=other' % game.pk, ''):
+            for path in ('/game/', '/roll/'):
+                response = client.get(path, QUERY_STRING=query)
+                status, headers, content = asgi_response(asgi_request('GET', path, query.encode('latin1')))
+                self.assertEqual((status, content), (response.status_code, response.json()),
+                                 msg="Invalid response of GET %s?%s" % (path, query))
+
+        for params in ({'game': game.pk, 'roll': 0}, {'game': game.pk, 'roll': MAX_PINS + 1},
+                       {'game': game.pk, 'roll': True}, {'game': str(game.pk), 'roll': '1'}, {'game': 0, 'roll': 1},
+                       {'game': game.pk, 'roll': 1, 'since': 9}, {'roll': 1}):
+            body = json.dumps(params)
+            response = client.post('/roll/', body, content_type='application/json')
+            status, headers, content = asgi_response(asgi_request(
+                'POST', '/roll/', body=body.encode('utf-8'), headers=[(b'content-type', b'application/json')]
+            ))
+            self.assertEqual(status, response.status_code, msg="Invalid status of POST %s" % body)
+
+            if status == 200:
+                # The roll is added by both
+                self.assertEqual(content['game'], response.json()['game'], msg="Invalid game of POST %s" % body)
+            else:
+                self.assertEqual(content, response.json(), msg="Invalid errors of POST %s" % body)
+
+    def test_non_integer_params(self):
+        """Test floats and booleans are validated by Django instead of being truncated"""
+        game = Game.objects.create()
+        json_body = [(b'content-type', b'application/json')]
+
+        for params in ({'game': game.pk + 0.9, 'roll': 1}, {'game': game.pk, 'roll': True},
+                       {'game': game.pk, 'roll': 5.7}, {'game': True, 'roll': 1}):
+            status, headers, content = asgi_response(asgi_request(
+                'POST', '/roll/', body=json.dumps(params).encode('utf-8'), headers=json_body
+            ))
+            self.assertEqual(status, 400, msg="Invalid status for %s" % params)
+
+        status, headers, content = asgi_response(asgi_request('GET', '/game/', b'game=%d.5' % game.pk))
+        self.assertEqual(status, 400, msg="Invalid status")
+
+        self.assertEqual(Game.objects.get(pk=game.pk).packed_rolls, '', msg="Roll saved")
+
+
+@override_settings(STREAM_BUFFER=2)
+class PubSubTestCase(TestCase):
+    def test_bounded_buffer(self):
+        pubsub = LocalPubSub()
+        subscription = pubsub.subscribe(1)
+
+        for rolls_count in range(1, 5):
+            pubsub.publish(1, rolls_count)
+
+        pubsub.publish(2, 1)
+
+        self.assertEqual(subscription.dropped, 2, msg="Invalid dropped messages")
+        self.assertEqual(subscription.get(0), 3, msg="Invalid message")
+        self.assertEqual(subscription.get(0), 4, msg="Invalid message")
+        self.assertIsNone(subscription.get(0.01), msg="Unexpected message")
+
+        pubsub.unsubscribe(subscription)
+        pubsub.publish(1, 5)
+        self.assertIsNone(subscription.get(0), msg="Message after unsubscribe")
+
+    def test_async_get(self):
+        pubsub = LocalPubSub()
+        subscription = pubsub.subscribe(1)
+        loop = asyncio.new_event_loop()
+
+        async def receive():
+            threading.Timer(0.01, pubsub.publish, (1, 1)).start()
+            return await subscription.aget(1)
+
+        self.assertEqual(loop.run_until_complete(receive()), 1, msg="Invalid message")
+        self.assertIsNone(loop.run_until_complete(subscription.aget(0.01)), msg="Unexpected message")
+
+
+def parse_event(content):
+    """Parses a Server-Sent Event to its id, name and data"""
+    fields = dict(line.split(': ', 1) for line in content.decode('utf-8').strip().split('\n'))
+    return int(fields['id']) if 'id' in fields else None, fields.get('event'), json.loads(fields.get('data', 'null'))
+
+
+@override_settings(STREAM_HEARTBEAT=0.01, STREAM_POLL=0.01)
+class StreamTestCase(TransactionTestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def test_stream(self):
+        game = Game.objects.create()
+        game.add_roll(MAX_PINS - 1)
+
+        response = get(reverse('game-stream', args=[game.pk]), HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream', msg="Invalid content type")
+        events = iter(response.streaming_content)
+
+        id, name, data = parse_event(next(events))
+        self.assertEqual((id, name), (1, 'score'), msg="Invalid event")
+        self.assertEqual(data['score'][0]['rolls'], [MAX_PINS - 1], msg="Invalid score")
+
+        game.add_roll(1)
+        id, name, data = parse_event(next(events))
+        self.assertEqual((id, name), (2, 'score'), msg="Invalid event")
+        self.assertEqual(data['since'], 1, msg="Invalid since")
+        self.assertEqual(data['score'][0]['rolls'], [MAX_PINS - 1, 1], msg="Invalid changed frames")
+
+        self.assertEqual(next(events), b': heartbeat\n\n', msg="Missing heartbeat")
+
+        response.close()
+        self.assertEqual(get_pubsub()._subscriptions, {}, msg="Subscription left after close")
+
+    def test_unpublished_roll(self):
+        """Test a roll published to another process reaches the stream when the game is read after a heartbeat"""
+        game = Game.objects.create()
+
+        response = get(reverse('game-stream', args=[game.pk]))
+        events = iter(response.streaming_content)
+        self.assertEqual(parse_event(next(events))[:2], (0, 'score'), msg="Invalid event")
+        self.assertEqual(next(events), b': heartbeat\n\n', msg="Missing heartbeat")
+
+        with mock.patch('bowling.models.publish_roll'):
+            game.add_roll(MAX_PINS)
+
+        id, name, data = parse_event(next(events))
+        response.close()
+
+        self.assertEqual((id, name), (1, 'score'), msg="Invalid event")
+        self.assertEqual(data['score'][0]['rolls'], [MAX_PINS], msg="Invalid score")
+
+    @override_settings(STREAM_HEARTBEAT=60)
+    def test_poll(self):
+        """Test a roll published to another process reaches the stream after STREAM_POLL without a heartbeat"""
+        game = Game.objects.create()
+
+        response = get(reverse('game-stream', args=[game.pk]))
+        events = iter(response.streaming_content)
+        self.assertEqual(parse_event(next(events))[:2], (0, 'score'), msg="Invalid event")
+
+        with mock.patch('bowling.models.publish_roll'):
+            game.add_roll(MAX_PINS)
+
+        content = next(events)
+        response.close()
+
+        self.assertEqual(parse_event(content)[:2], (1, 'score'), msg="Invalid event")
+
+    def test_last_event_id(self):
+        game = Game.objects.create()
+        game.add_rolls([1, 2, 3])
+
+        response = get(reverse('game-stream', args=[game.pk]), HTTP_LAST_EVENT_ID='2')
+        id, name, data = parse_event(next(iter(response.streaming_content)))
+        response.close()
+
+        self.assertEqual(id, 3, msg="Invalid id")
+        self.assertEqual(data['since'], 2, msg="Invalid since")
+        self.assertEqual([frame['rolls'] for frame in data['score']], [[3]], msg="Invalid changed frames")
+
+    def test_finished_game(self):
+        game = Game.objects.create()
+        game.add_rolls([0] * MAX_FRAMES * 2)
+
+        response = get(reverse('game-stream', args=[game.pk]))
+        events = list(response.streaming_content)
+
+        self.assertEqual(len(events), 1, msg="The stream of a finished game must end")
+
+    def test_invalid_game(self):
+        response = get(reverse('game-stream', args=[0]), HTTP_ACCEPT='text/event-stream')
+
+        self.assertEqual(response.status_code, 400, msg="Invalid status")
+        self.assertEqual(parse_event(response.content)[1:], ('error', {'game': ["Game does not exist!"]}),
+                         msg="Invalid error event")
+
+    @unittest.skipUnless(asgi, "asgiref is not installed")
+    def test_asgi_stream(self):
+        game = Game.objects.create()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        disconnect = asyncio.Event(loop=loop)
+        bodies = []
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] != 'http.response.body':
+                return
+
+            bodies.append(message['body'])
+
+            if len(bodies) == 1:
+                # The stream is running, roll from another thread like the roll endpoint
+                threading.Thread(target=game.add_roll, args=(MAX_PINS,)).start()
+            elif parse_event(message['body'])[1] == 'score':
+                disconnect.set()
+
+        loop.run_until_complete(asgi.application({
+            'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': '/game/%d/stream' % game.pk,
+            'query_string': b'', 'headers': [(b'last-event-id', b'0')]
+        }, receive, send))
+
+        events = [parse_event(body) for body in bodies if body != b': heartbeat\n\n']
+        self.assertEqual([(id, name) for id, name, data in events], [(1, 'score')], msg="Invalid events")
+        self.assertEqual(get_pubsub()._subscriptions, {}, msg="Subscription left after disconnect")
+
+    @unittest.skipUnless(asgi, "asgiref is not installed")
+    def test_asgi_unpublished_roll(self):
+        """Test the ASGI stream reads the game again after a heartbeat like the Django view"""
+        game = Game.objects.create()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        disconnect = asyncio.Event(loop=loop)
+        bodies = []
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] != 'http.response.body':
+                return
+
+            bodies.append(message['body'])
+
+            if message['body'] == b': heartbeat\n\n' and len(bodies) == 2:
+                threading.Thread(target=game.add_roll, args=(MAX_PINS,)).start()
+            elif len(bodies) > 1 and parse_event(message['body'])[1] == 'score':
+                disconnect.set()
+
+        with mock.patch('bowling.models.publish_roll'):
+            loop.run_until_complete(asgi.application({
+                'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': '/game/%d/stream' % game.pk,
+                'query_string': b'', 'headers': []
+            }, receive, send))
+
+        events = [parse_event(body) for body in bodies if body != b': heartbeat\n\n']
+        self.assertEqual([(id, name) for id, name, data in events], [(0, 'score'), (1, 'score')], msg="Invalid events")
+
+
+class BenchmarkTestCase(TestCase):
+    def test_workloads(self):
+        """Test the benchmarked games are legal and the random and prefix workloads are repeatable"""
+        loads = benchmark.workloads(games=20)
+
+        self.assertEqual(list(loads), ['perfect', 'gutter', 'spare-heavy', 'random', 'prefix'], msg="Invalid workloads")
+        self.assertEqual(loads, benchmark.workloads(games=20), msg="Workloads are not repeatable")
+
+        for name, games in loads.items():
+            for rolls in games:
+                state = INITIAL_STATE
+
+                for roll in rolls:
+                    state = advance(state, roll)
+
+                self.assertEqual(finished(state), name != 'prefix', msg="Invalid %s game %s" % (name, rolls))
+                self.assertEqual(generate(rolls)[-1].score, state.total, msg="Invalid %s score" % name)
+
+    def test_compare(self):
+        results = benchmark.run(number=2, games=2)
+        name = 'advance/perfect'
+
+        self.assertIn(name, results, msg="Missing benchmark")
+        self.assertEqual(benchmark.compare(results, results), [], msg="Regression against itself")
+
+        baseline = copy.deepcopy(results)
+        baseline[name]['ops'] = results[name]['ops'] * 2
+        baseline[name]['peak_bytes'] = results[name]['peak_bytes'] // 2
+
+        self.assertEqual(len(benchmark.compare(results, baseline)), 2, msg="Regressions not found")
+
+        merged = benchmark.slowest([results, baseline])
+        self.assertEqual(merged[name]['ops'], results[name]['ops'], msg="Not the slowest calls per second")
+        self.assertEqual(merged[name]['peak_bytes'], results[name]['peak_bytes'], msg="Not the largest memory")
+
+    def test_missing_baseline(self):
+        """Test the command and the script both fail without a baseline"""
+        path = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+
+        with self.assertRaisesMessage(CommandError, "No baseline %s" % path):
+            call_command('benchmark_score', number=1, baseline=path, stdout=io.StringIO())
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(benchmark.main(['--number', '1', '--baseline', path]), 1, msg="Missing baseline passed")
+
+
+class LoadTestTestCase(TestCase):
+    def test_tournament(self):
+        """Test the bowlers roll legal games while the spectators poll them with the ETag"""
+        class FakeClient(object):
+            def __init__(self):
+                self.requests = []
+                self.last_headers = []
+
+            def request(self, method, path, params, headers=None):
+                self.requests.append((method, path, params, headers))
+
+                if method == 'GET':
+                    self.last_headers = [('ETag', '"1-1"')]
+
+                return 200, {'game': 1}
+
+        work = tournament(bowlers=1, games=2, poll=0.001)
+        bowler, spectator = FakeClient(), FakeClient()
+        thread = threading.Thread(target=work, args=(spectator, 1))
+        thread.start()
+        work(bowler, 0)
+        thread.join()
+
+        self.assertEqual([request[1] for request in bowler.requests].count('/game/'), 2, msg="Invalid games")
+
+        state = INITIAL_STATE
+        for method, path, params, headers in bowler.requests[1:]:
+            if path == '/game/':
+                self.assertTrue(finished(state), msg="The game is not finished")
+                state = INITIAL_STATE
+                continue
+
+            state = advance(state, params['roll'])
+
+        self.assertTrue(finished(state), msg="The game is not finished")
+
+        if len(spectator.requests) > 1:
+            self.assertEqual(spectator.requests[-1][3], {'If-None-Match': '"1-1"'}, msg="Missing ETag")
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+        metrics.clear()
+
+    def test_histogram(self):
+        histogram = metrics.Histogram('test_seconds', "Test", (0.1, 1), ('endpoint',))
+        metrics._registry.pop('test_seconds')
+
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'GET game')
+
+        self.assertEqual(histogram.render(), [
+            '# HELP test_seconds Test',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{endpoint="GET game",le="0.1"} 1',
+            'test_seconds_bucket{endpoint="GET game",le="1"} 2',
+            'test_seconds_bucket{endpoint="GET game",le="+Inf"} 3',
+            'test_seconds_sum{endpoint="GET game"} 5.55',
+            'test_seconds_count{endpoint="GET game"} 3',
+        ], msg="Invalid histogram")
+
+    def test_endpoint_metrics(self):
+        game = Game.objects.create()
+        post(reverse('roll'), {'game': game.pk, 'roll': MAX_PINS})
+
+        response = get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200, msg="Invalid status")
+        lines = response.content.decode('utf-8').splitlines()
+
+        for line in ('bowling_request_seconds_count{endpoint="POST roll"} 1',
+                     'bowling_sql_queries_count{endpoint="POST roll"} 1',
+                     'bowling_score_seconds_count{endpoint="POST roll"} 1',
+                     'bowling_function_seconds_count{function="Game.add_roll"} 1',
+                     'bowling_function_seconds_count{function="Game.score"} 1'):
+            self.assertIn(line, lines, msg="Missing %s" % line)
+
+        queries = [line for line in lines if line.startswith('bowling_sql_queries_sum{endpoint="POST roll"}')]
+        self.assertGreater(float(queries[0].split()[-1]), 0, msg="No SQL queries recorded")
+
+    def test_shared_directory(self):
+        """Test the metrics of all the worker processes are rendered by any of them"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(metrics.share, None)
+        metrics.REQUEST_SECONDS.observe(0.001, 'GET game')
+
+        # Another worker which has ended and one which is still running
+        for pid in (2 ** 22 + 1, os.getppid()):
+            with open(os.path.join(directory, '%d.json' % pid), 'w') as snapshot:
+                json.dump({
+                    'bowling_request_seconds': [[['GET game'], [[2] + [0] * len(metrics.SECONDS_BUCKETS), 0.5, 2]]],
+                    'bowling_score_memo_prefixes': 7
+                }, snapshot)
+
+        with override_settings(METRICS_DIR=directory):
+            lines = get(reverse('metrics')).content.decode('utf-8').splitlines()
+
+        for line in ('bowling_request_seconds_count{endpoint="GET game"} 3',
+                     'bowling_request_seconds_bucket{endpoint="GET game",le="0.0001"} 2',
+                     'bowling_score_memo_prefixes{pid="%d"} 7' % os.getppid(),
+                     'bowling_score_memo_prefixes{pid="%d"} 0' % os.getpid()):
+            self.assertIn(line, lines, msg="Missing %s" % line)
+
+        self.assertNotIn('pid="%d"' % (2 ** 22 + 1), '\n'.join(lines), msg="Gauge of an ended process")
+        self.assertEqual(sorted(os.listdir(directory)), sorted('%d.json' % pid for pid in (os.getpid(), os.getppid())),
+                         msg="Invalid metrics files")
+
+    def test_concurrent_dump(self):
+        """Test the flush thread and a scrape can write the metrics of the process at the same time"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        errors = []
+
+        def dump():
+            try:
+                for _ in range(50):
+                    metrics.dump(directory)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=dump) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [], msg="Concurrent dumps failed")
+        self.assertEqual(os.listdir(directory), ['%d.json' % os.getpid()], msg="Invalid metrics files")
+
+
+def statement_shape(sql):
+    """Returns the statement type and the table of an SQL query, eg. 'SELECT bowling_game'"""
+    match = re.match(r'\s*(SELECT .*? FROM|INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', sql, re.IGNORECASE | re.DOTALL)
+
+    if match:
+        return '%s %s' % (match.group(1).split()[0].upper(), match.group(2))
+
+    return sql.split()[0].upper()
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    The exact SQL statements of each endpoint. A change adding a query fails here,
+    raise the budget only when the query is really needed.
+    """
+    def setUp(self):
+        caches[settings.SCORE_CACHE].clear()
+
+    def assertQueries(self, expected, request):
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+
+        self.assertEqual([statement_shape(query['sql']) for query in queries], expected,
+                         msg="Query budget exceeded:\n%s" % '\n'.join(query['sql'] for query in queries))
+
+        return response
+
+    def test_create_game(self):
+        response = self.assertQueries(['INSERT bowling_game'], lambda: post(reverse('game')))
+        self.assertEqual(response.status_code, 200, msg="Invalid status")
+
+    def test_game(self):
+        game = Game.objects.create()
+        game.add_rolls([1, 2, 3])
+
+        response = self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': game.pk}))
+        self.assertEqual(response.status_code, 200, msg="Invalid status")
+
+        # Cached score
+        self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': game.pk}))
+
+        response = self.assertQueries(['SELECT bowling_game'], lambda: get(
+            reverse('game'), {'game': game.pk}, HTTP_IF_NONE_MATCH=response['ETag']
+        ))
+        self.assertEqual(response.status_code, 304, msg="Invalid status")
+
+        self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': game.pk, 'since': 1}))
+        self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': game.pk, 'view': 'summary'}))
+        self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': '%d,%d' % (game.pk, 0)}))
+        self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('game'), {'game': 0}))
+
+    def test_roll(self):
+        game = Game.objects.create()
+
+        response = self.assertQueries(['SELECT bowling_game', 'UPDATE bowling_game'],
+                                      lambda: post(reverse('roll'), {'game': game.pk, 'roll': 3}))
+        self.assertEqual(response.status_code, 200, msg="Invalid status")
+
+        response = self.assertQueries(['SELECT bowling_game', 'UPDATE bowling_game'],
+                                      lambda: post(reverse('roll'), {'game': game.pk, 'roll': 4, 'since': 1}))
+        self.assertEqual(data(response)['since'], 1, msg="Invalid since")
+
+        self.assertQueries(['SELECT bowling_game', 'UPDATE bowling_game'],
+                           lambda: post(reverse('roll'), {'game': game.pk, 'roll': 5}))
+
+        # An invalid roll is rejected by the stored state without writing
+        response = self.assertQueries(['SELECT bowling_game'],
+                                      lambda: post(reverse('roll'), {'game': game.pk, 'roll': MAX_PINS}))
+        self.assertEqual(response.status_code, 400, msg="Invalid status")
+
+        self.assertQueries([], lambda: post(reverse('roll'), {'game': game.pk, 'roll': MAX_PINS + 1}))
+
+    def test_next_roll(self):
+        game = Game.objects.create()
+
+        response = self.assertQueries(['SELECT bowling_game'], lambda: get(reverse('roll'), {'game': game.pk}))
+        self.assertEqual(response.status_code, 200, msg="Invalid status")
+
+    @override_settings(ROLL_AUDIT=True)
+    def test_audited_roll(self):
+        game = Game.objects.create()
+
+        self.assertQueries(
+            ['SELECT bowling_game', 'SAVEPOINT', 'UPDATE bowling_game', 'INSERT bowling_roll', 'RELEASE'],
+            lambda: post(reverse('roll'), {'game': game.pk, 'roll': 3})
+        )
+
+    def test_rolls(self):
+        game = Game.objects.create()
+
+        self.assertQueries(['SELECT bowling_game', 'UPDATE bowling_game'], lambda: self.client.post(
+            reverse('rolls'), json.dumps({'game': game.pk, 'rolls': [1, 2, 3]}), content_type='application/json'
+        ))
+
+
+class ImportTestCase(TestCase):
+    def write(self, suffix, content):
+        source = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        self.addCleanup(os.remove, source.name)
+
+        with source:
+            source.write(content)
+
+        return source.name
+
+    def test_jsonl(self):
+        expected, rolls = generate_rolls(copy.deepcopy(DELASPORT_ROLLS))
+        path = self.write('.jsonl', '\n'.join([
+            json.dumps({'rolls': rolls}),
+            json.dumps([MAX_PINS - 1, 2]),
+            '',
+            '{"rolls": [1, ',
+            json.dumps([3, 4, 5]),
+        ]))
+        rejects = self.write('.jsonl', '')
+        output = io.StringIO()
+
+        call_command('import_games', path, rolls=True, rejects=rejects, chunk=1, stdout=output)
+
+        self.assertIn('Imported 2 games', output.getvalue(), msg="Invalid report")
+        self.assertIn('2 rejected', output.getvalue(), msg="Invalid report")
+
+        games = list(Game.objects.order_by('pk'))
+        self.assertEqual([unpack_rolls(game.packed_rolls) for game in games], [rolls, [3, 4, 5]], msg="Invalid rolls")
+        self.assertEqual(games[0].state, functools.reduce(advance, rolls, INITIAL_STATE), msg="Invalid state")
+        self.assertEqual(Roll.objects.count(), len(rolls) + 3, msg="Invalid Roll rows")
+        validate_score(self, expected, data(get(reverse('game'), {'game': games[0].pk}))['score'])
+
+        with open(rejects) as rejected:
+            rejected = [json.loads(line) for line in rejected]
+
+        self.assertEqual([reject['line'] for reject in rejected], [2, 4], msg="Invalid rejected lines")
+        self.assertEqual(rejected[0]['error'], "Exceeded maximum pins for a frame!", msg="Invalid error")
+
+        # The API creates the next games after the imported ones
+        self.assertEqual(data(post(reverse('game')))['game'], games[-1].pk + 1, msg="Invalid new game id")
+
+    def test_csv(self):
+        path = self.write('.csv', '10,10,10,10,10,10,10,10,10,10,10,10\n1,2\n1,a\n')
+        output = io.StringIO()
+
+        call_command('import_games', path, finished=True, stdout=output)
+
+        self.assertIn('Imported 1 games (1 rows)', output.getvalue(), msg="Invalid report")
+        self.assertIn('2 rejected', output.getvalue(), msg="Invalid report")
+        self.assertEqual(Game.objects.get().total, 300, msg="Invalid total")
+        self.assertEqual(Roll.objects.count(), 0, msg="Roll rows without ROLL_AUDIT")
+
+    def test_chunks(self):
+        """Test the games are written with a bulk INSERT per chunk and a transaction per batch of chunks"""
+        records = [(index + 1, json.dumps([index % MAX_PINS])) for index in range(10)]
+
+        with CaptureQueriesContext(connection) as queries:
+            report = import_games(iter(records), JSONL_FORMAT, chunk_size=3, batch_size=2)
+
+        shapes = [statement_shape(query['sql']) for query in queries]
+        self.assertEqual(report['games'], 10, msg="Invalid games")
+        self.assertEqual(shapes.count('INSERT bowling_game'), 4, msg="Invalid inserts")
+        self.assertEqual(shapes.count('SAVEPOINT'), 2, msg="Invalid transactions")
+
+        # Each transaction locks the creation of games before it reads the last id
+        self.assertEqual([shape for shape in shapes if shape in ('UPDATE bowling_game', 'SELECT bowling_game')],
+                         ['UPDATE bowling_game', 'SELECT bowling_game'] * 2, msg="Games not locked")
+        self.assertEqual(sorted(Game.objects.values_list('rolls_count', flat=True)), [1] * 10, msg="Invalid games")
+
+    def test_failure(self):
+        """Test the sequence is reset after the committed transactions when a later one fails"""
+        records = [(index + 1, json.dumps([index % MAX_PINS])) for index in range(4)]
+
+        def progress(report):
+            raise RuntimeError("Interrupted")
+
+        with mock.patch('bowling.importer.reset_sequences') as reset:
+            with self.assertRaises(RuntimeError, msg="The failure is not raised"):
+                import_games(iter(records), JSONL_FORMAT, chunk_size=2, batch_size=1, progress=progress)
+
+        self.assertEqual(reset.call_count, 1, msg="The sequence is not reset")
+        self.assertEqual(Game.objects.count(), 2, msg="The committed games are not kept")
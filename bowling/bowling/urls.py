@@ -15,10 +15,8 @@ Including another URLconf
 """
 from django.conf.urls import url
 from django.contrib import admin
-from .views import *
+from . import urls_api
 
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
-    url(r'^game/', GameView.as_view(), name='game'),
-    url(r'^roll/', RollView.as_view(), name='roll'),
-]
+] + urls_api.urlpatterns
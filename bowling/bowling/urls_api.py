@@ -0,0 +1,18 @@
+"""bowling API URL Configuration
+
+The API endpoints without the admin, used by the API only settings.
+"""
+from django.conf import settings
+from django.conf.urls import url
+from .views import *
+
+urlpatterns = [
+    url(r'^game/', GameView.as_view(), name='game'),
+    url(r'^roll/', RollView.as_view(), name='roll'),
+    url(r'^rolls/', RollsView.as_view(), name='rolls'),
+    url(r'^metrics$', prometheus_metrics, name='metrics'),
+]
+
+if settings.STREAM_WSGI:
+    # Before the game URL which matches it too, bowling.asgi serves the streams itself
+    urlpatterns.insert(0, url(r'^game/(?P<game>\d+)/stream/?$', GameStreamView.as_view(), name='game-stream'))
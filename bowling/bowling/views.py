@@ -1,48 +1,375 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import views, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from . import metrics
+from .cache import get_score, set_score
 from .models import Game
-from .serializers import GameRequestSerializer, RollRequestSerializer, ScoreSerializer
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .serializers import SUMMARY_VIEW, GameRequestSerializer, GamesRequestSerializer, NextRollRequestSerializer, \
+    RollRequestSerializer, RollsRequestSerializer, next_roll_data, score_data, summary_data
+from .stream import last_event_id, stream
 
+# Errors of a game id which does not exist
+GAME_NOT_FOUND = {'game': ["Game does not exist!"]}
 
-def game_info(params):
+
+class RenderedResponse(HttpResponse):
+    """
+    Response with already rendered JSON content
     """
-    Generates game information and returns it as Response
+    def __init__(self, content, status=status.HTTP_200_OK):
+        super(RenderedResponse, self).__init__(content, status=status, content_type='application/json')
 
-    :param params: Dict with game key
-    :type params: dict
 
-    :return: Response
+def game_etag(game, rolls_count, view=None):
+    """
+    Returns the ETag of a game information, it changes with each roll
+
+    :param game: Game id
+    :type game: int
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+
+    :param view: SUMMARY_VIEW for the summary, the summary and the frames have different ETags
+    :type view: str|None
+
+    :rtype: str
+    """
+    if view == SUMMARY_VIEW:
+        return '%d-%d-%s' % (game, rolls_count, view)
+
+    return '%d-%d' % (game, rolls_count)
+
+
+def find_game(pk):
+    """
+    Returns a game by id with a single query
+
+    :param pk: Game id
+    :type pk: int
+
+    :return: The game or None if it does not exist
+    :rtype: Game|None
+    """
+    return Game.objects.filter(pk=pk).first()
+
+
+def game_not_found():
+    """
+    Returns 400 response for a game which does not exist
     :rtype: Response
     """
+    return Response(GAME_NOT_FOUND, status=status.HTTP_400_BAD_REQUEST)
+
+
+def error_result(detail, status_code=status.HTTP_400_BAD_REQUEST):
+    """
+    Returns the result of an invalid request
+
+    :param detail: Errors like serializer.errors
+    :type detail: dict|list
+
+    :param status_code: HTTP status code
+    :type status_code: int
+
+    :return: Status code, rendered JSON content and no ETag
+    :rtype: (int, bytes, None)
+    """
+    return status_code, JSONRenderer().render(detail), None
+
+
+def result_response(result):
+    """
+    Returns the response of a result of the shared request functions below.
+    They take and return only primitives so the async handlers of bowling.asgi use them too.
+
+    :param result: Status code, rendered JSON content and ETag or None
+    :type result: (int, bytes, str|None)
+
+    :rtype: HttpResponse
+    """
+    status_code, content, etag = result
+
+    if status_code == status.HTTP_304_NOT_MODIFIED:
+        response = HttpResponseNotModified()
+    else:
+        response = RenderedResponse(content, status_code)
+
+    if etag is not None:
+        response['ETag'] = quote_etag(etag)
+
+    return response
+
+
+def not_modified(game, if_none_match, view=None):
+    """
+    Returns 304 result if the client already has the current game information.
+
+    :param game: The game
+    :type game: Game
+
+    :param if_none_match: If-None-Match header of the request or None
+    :type if_none_match: str|None
+
+    :param view: View of the game information the client has
+    :type view: str|None
+
+    :return: Result or None if the game is changed
+    :rtype: (int, bytes, str)|None
+    """
+    if not if_none_match:
+        return None
+
+    etag = game_etag(game.pk, game.rolls_count, view)
+
+    if if_none_match.strip() != '*' and etag not in parse_etags(if_none_match):
+        return None
+
+    return status.HTTP_304_NOT_MODIFIED, b'', etag
+
+
+def invalid_since(since, rolls_count):
+    """
+    Returns 400 result if the client cannot know more rolls than the game has
+
+    :param since: Number of rolls known by the client or None
+    :type since: int|None
+
+    :param rolls_count: Number of rolls in the game
+    :type rolls_count: int
+
+    :rtype: (int, bytes, None)|None
+    """
+    if since is not None and since > rolls_count:
+        return error_result({'since': ["The game has only %d rolls!" % rolls_count]})
+
+    return None
+
+
+def delta_info(game, since):
+    """
+    Generates the game frames changed since the client known rolls count
+
+    :param game: The game
+    :type game: Game
+
+    :param since: Number of rolls known by the client
+    :type since: int
+
+    :return: Status code, rendered JSON content and ETag or None
+    :rtype: (int, bytes, str|None)
+    """
+    try:
+        score = game.score_since(since)
+    except ValidationError as e:
+        return error_result(e.detail, e.status_code)
+
+    response = score_data(game.pk, score)
+    response['rolls_count'] = game.rolls_count
+    response['since'] = since
+
+    return status.HTTP_200_OK, FastJSONRenderer().render(response), None
+
+
+def game_response(game, since=None):
+    """
+    Generates game information of an already read game.
+    The rendered information is cached until a roll is added to the game.
+    If since is given only the frames changed after the game had that many rolls are returned.
+
+    :param game: The game
+    :type game: Game
+
+    :param since: Number of rolls known by the client or None
+    :type since: int|None
+
+    :return: Status code, rendered JSON content and ETag or None
+    :rtype: (int, bytes, str|None)
+    """
+    if since is not None:
+        return invalid_since(since, game.rolls_count) or delta_info(game, since)
+
+    content = get_score(game.pk, game.rolls_count)
+
+    if content is None:
+        try:
+            score = game.score()
+        except ValidationError as e:
+            return error_result(e.detail, e.status_code)
+
+        content = FastJSONRenderer().render(score_data(game.pk, score))
+        set_score(game.pk, game.rolls_count, content)
+
+    return status.HTTP_200_OK, content, game_etag(game.pk, game.rolls_count)
+
+
+def summary_response(game):
+    """
+    Returns the running score of an already read game.
+    It's read from the stored scoring state so nothing is scored or serialized with FrameSerializer.
+
+    :param game: The game
+    :type game: Game
+
+    :return: Status code, rendered JSON content and ETag
+    :rtype: (int, bytes, str)
+    """
+    content = FastJSONRenderer().render(summary_data(game.pk, game.summary()))
+
+    return status.HTTP_200_OK, content, game_etag(game.pk, game.rolls_count, SUMMARY_VIEW)
+
+
+def game_info(params, if_none_match=None):
+    """
+    Generates game information, or information for many games if the game key has comma separated ids.
+    The game is read with a single query.
+
+    :param params: Dict with game key and optional since and view keys
+    :type params: dict
+
+    :param if_none_match: If-None-Match header of the request or None
+    :type if_none_match: str|None
+
+    :return: Status code, rendered JSON content and ETag or None
+    :rtype: (int, bytes, str|None)
+    """
+    if ',' in str(params.get('game', '')):
+        return games_info(params)
+
     serializer = GameRequestSerializer(data=params)
 
     if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return error_result(serializer.errors)
+
+    game = find_game(serializer.validated_data['game'])
+
+    if game is None:
+        return error_result(GAME_NOT_FOUND)
+
+    since = serializer.validated_data.get('since')
+    view = serializer.validated_data['view']
+
+    if since is None or view == SUMMARY_VIEW:
+        result = not_modified(game, if_none_match, view)
+
+        if result:
+            return result
+
+    if view == SUMMARY_VIEW:
+        # The summary is always complete so since is not needed
+        return summary_response(game)
+
+    return game_response(game, since)
+
+
+def games_info(params):
+    """
+    Generates information for many games.
+    The games which does not exist or cannot be scored have errors instead of a score.
+
+    :param params: Dict with game key containing comma separated game ids and optional view key
+    :type params: dict
+
+    :return: Status code, rendered JSON content and no ETag
+    :rtype: (int, bytes, None)
+    """
+    serializer = GamesRequestSerializer(data=params)
+
+    if not serializer.is_valid():
+        return error_result(serializer.errors)
+
+    rolls = Game.rolls_many(serializer.validated_data['game'])
+    summaries = serializer.validated_data['view'] == SUMMARY_VIEW
+    response = []
+
+    for pk in serializer.validated_data['game']:
+        if pk not in rolls:
+            response.append({'game': pk, 'errors': GAME_NOT_FOUND})
+            continue
+
+        try:
+            if summaries:
+                response.append(summary_data(pk, Game.summarize_rolls(rolls[pk])))
+            else:
+                response.append(score_data(pk, Game.score_rolls(rolls[pk])))
+        except ValidationError as e:
+            response.append({'game': pk, 'errors': e.detail})
+
+    return status.HTTP_200_OK, FastJSONRenderer().render(response), None
+
+
+def next_roll_info(params):
+    """
+    Returns the legal range of the next roll computed from the stored scoring state with a single query
+
+    :param params: Dict with game key
+    :type params: dict
+
+    :return: Status code, rendered JSON content and no ETag
+    :rtype: (int, bytes, None)
+    """
+    serializer = NextRollRequestSerializer(data=params)
+
+    if not serializer.is_valid():
+        return error_result(serializer.errors)
+
+    game = find_game(serializer.validated_data['game'])
+
+    if game is None:
+        return error_result(GAME_NOT_FOUND)
+
+    return status.HTTP_200_OK, FastJSONRenderer().render(next_roll_data(game.pk, game.state, game.next_roll())), None
 
-    game = Game.objects.get(pk=serializer.data['game'])
+
+def add_roll(params):
+    """
+    Adds a roll to the game and returns the game information
+
+    :param params: Dict with game and roll keys and optional since key
+    :type params: dict
+
+    :return: Status code, rendered JSON content and ETag or None
+    :rtype: (int, bytes, str|None)
+    """
+    serializer = RollRequestSerializer(data=params)
+
+    if not serializer.is_valid():
+        return error_result(serializer.errors)
+
+    game = find_game(serializer.validated_data['game'])
+
+    if game is None:
+        return error_result(GAME_NOT_FOUND)
+
+    since = serializer.validated_data.get('since')
+    result = invalid_since(since, game.rolls_count + 1)
+
+    if result:
+        return result
 
     try:
-        score = game.score()
+        game.add_roll(serializer.validated_data['roll'])
     except ValidationError as e:
-        return Response(e.detail, status=e.status_code)
-
-    response = ScoreSerializer({
-        'game': game.pk,
-        'score': score
-    })
+        return error_result(e.detail, e.status_code)
 
-    return Response(response.data)
+    # The game is up to date after the roll so it's not read again
+    return game_response(game, since)
 
 
 class GameView(views.APIView):
     def get(self, request):
         """
         Returns game information
-        Params: {game: id}
+        Params: {game: id, since: int (optional), view: frames|summary (optional)}
+        or {game: id,id,..., view: frames|summary (optional)} for many games
         """
-        return game_info(request.query_params)
+        return result_response(game_info(request.query_params, request.META.get('HTTP_IF_NONE_MATCH')))
 
     def post(self, request):
         """
@@ -50,24 +377,72 @@ class GameView(views.APIView):
         Params: None
         """
         game = Game.objects.create()
-        return game_info({'game': game.pk})
+        return result_response(game_response(game))
+
+
+class GameStreamView(views.APIView):
+    renderer_classes = (JSONRenderer, EventStreamRenderer)
+
+    def get(self, request, game):
+        """
+        Streams the game score as Server-Sent Events, the frames changed by each roll are sent when it's saved.
+        Params: Last-Event-ID header with the rolls count the client already has (optional)
+        """
+        if not Game.objects.filter(pk=game).exists():
+            return game_not_found()
+
+        response = StreamingHttpResponse(
+            stream(int(game), last_event_id(request.META.get('HTTP_LAST_EVENT_ID'))),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+
+        return response
 
 
 class RollView(views.APIView):
+    def get(self, request):
+        """
+        Returns the legal range of the next roll so it can be validated before it's posted.
+        Params {game: int}
+        """
+        return result_response(next_roll_info(request.query_params))
+
     def post(self, request):
         """
         Adds a roll to the game.
-        Params {game: int, roll: int}
+        Params {game: int, roll: int, since: int (optional)}
+        """
+        return result_response(add_roll(request.data))
+
+
+class RollsView(views.APIView):
+    def post(self, request):
         """
-        serializer = RollRequestSerializer(data=request.data)
+        Adds many rolls to the game at once.
+        Params {game: int, rolls: [int]}
+        """
+        serializer = RollsRequestSerializer(data=request.data)
 
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        game = Game.objects.get(pk=serializer.data['game'])
+        game = find_game(serializer.validated_data['game'])
+
+        if game is None:
+            return game_not_found()
+
         try:
-            game.add_roll(serializer.data['roll'])
+            game.add_rolls(serializer.validated_data['rolls'])
         except ValidationError as e:
             return Response(e.detail, status=e.status_code)
 
-        return game_info(request.data)
+        return result_response(game_response(game))
+
+
+def prometheus_metrics(request):
+    """
+    Returns the performance metrics in the Prometheus text format, of all the worker processes with METRICS_DIR.
+    A plain Django view so the scrapes skip the DRF content negotiation.
+    """
+    return HttpResponse(metrics.render(settings.METRICS_DIR), content_type='text/plain; version=0.0.4')
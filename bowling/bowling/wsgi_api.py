@@ -0,0 +1,17 @@
+"""
+WSGI config for the bowling API only.
+
+It exposes the WSGI callable as a module-level variable named ``application``
+with the lean bowling.settings_api settings.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/1.9/howto/deployment/wsgi/
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bowling.settings_api")
+
+application = get_wsgi_application()